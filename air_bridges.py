@@ -0,0 +1,75 @@
+import gdsfactory as gf
+import numpy as np
+
+from cell_cache import memo_cell
+
+# the air bridge family, sized from a table: the class of a span (the crossover length, um) sets the bridge width
+# and the pad length, class i takes spans up to span_breakpoints[i] (the first from min_span)
+min_span = 5
+span_breakpoints = np.array([16, 27, 32])
+bridge_widths = np.array([5, 7.5, 10])
+pad_lengths = np.array([8, 10, 14])
+# spans are rounded up to this grid, so a chip needs one cell per class and grid step
+span_step = 1
+tether = 1.5
+
+
+def bridge_class(span):
+    # index into the table for each span, works on arrays
+    span = np.asarray(span, dtype=float)
+    outside = (span < min_span) | (span > span_breakpoints[-1])
+    if np.any(outside):
+        raise ValueError(f'air bridge span {span[outside]} outside {min_span}-{span_breakpoints[-1]} um')
+    return np.searchsorted(span_breakpoints, span)
+
+
+def snap_span(span):
+    # up to the next grid step, a bridge is never shorter than the span it crosses
+    span = np.asarray(span, dtype=float)
+    bridge_class(span)
+    snapped = np.ceil(np.round(span/span_step, 9))*span_step
+    return np.minimum(snapped, span_breakpoints[-1])
+
+
+def bridge_sizes(span):
+    # (snapped span, bridge width, pad length) for every span
+    span = snap_span(span)
+    index = bridge_class(span)
+    return span, bridge_widths[index], pad_lengths[index]
+
+
+@memo_cell(basename='air_bridge')
+def bridge_cell(xvr_length):
+    _, xvr_width, RR_length = (size.item() for size in bridge_sizes(xvr_length))
+
+    RR_width = xvr_width + 3
+    Tether_width = RR_width + 2*tether
+    Tether_length = RR_length + 2*tether
+    Tether_offset = (Tether_width - xvr_width)/2
+
+    r3 = gf.kdb.DPolygon([(tether, tether), (RR_length+tether, tether), (RR_length+tether, RR_width+tether), (tether, RR_width+tether)])
+    r4 = gf.kdb.DPolygon([(Tether_length+xvr_length+tether, tether), (Tether_length+xvr_length+tether+RR_length, tether),
+                          (Tether_length+xvr_length+tether+RR_length, Tether_width-tether), (Tether_length+xvr_length+tether, Tether_width-tether)])
+    p_middle = gf.kdb.DPolygon([(Tether_length, Tether_offset), (Tether_length+xvr_length, Tether_offset), (Tether_length+xvr_length, Tether_width-Tether_offset), (Tether_length, Tether_width-Tether_offset)])
+    p_left = r3.sized(tether)
+    p_right = r4.sized(tether)
+
+    # drawn straight into one cell, rotated by 90 degrees and centered on the origin,
+    # so every bridge along a path stays a reference to this single leaf cell
+    # each layer is merged, the tethers and the bridge are one polygon
+    dbu = gf.kcl.dbu
+    bridge = gf.kdb.Region([p.to_itype(dbu) for p in (p_left, p_right, p_middle)]).transformed(gf.kdb.Trans.R90)
+    pads = gf.kdb.Region([p.to_itype(dbu) for p in (r3, r4)]).transformed(gf.kdb.Trans.R90)
+    center = (bridge + pads).bbox().center()
+    center = gf.kdb.Trans(-round(center.x), -round(center.y))
+
+    d = gf.Component()
+    d.add_polygon(bridge.merged().transformed(center), layer=(31, 0))
+    d.add_polygon(pads.merged().transformed(center), layer=(30, 0))
+
+    return d
+
+
+def air_bridge(xvr_length):
+    # the shared cell of the snapped span
+    return bridge_cell(snap_span(xvr_length).item())
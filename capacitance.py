@@ -0,0 +1,205 @@
+import cachetools
+import gdsfactory as gf
+import numpy as np
+
+from inverse_design import epsilon_eff
+
+# capacitance matrix of the drawn metal, from the (5,0) gap polygons of a built component, without an EM tool
+# the metal in a window around the xmon islands is cut into rectangular panels, graded from panel um at every metal
+# edge (where the charge piles up) to max_panel, and the charge on them solved for with the Green's function of a
+# sheet on the substrate, 1/(4 pi epsilon_0 epsilon_eff r) (a boundary-element / method of moments solve)
+# near panels see the exact potential of a uniformly charged rectangle, far ones a point charge
+# conductors are the connected parts of the metal in the window: the largest is ground, every other one is a net
+# of its own, e.g. the readout claw with its resonator trace cut at the window edge
+# capacitances in F, lengths in um
+epsilon_0 = 8.8541878128e-12
+gap_layer = (5, 0)
+junction_layer = (55, 0)  # the patches of jj_pair, they overlap the island and the ground
+margin = 80  # metal kept around the islands, um
+panel = 0.5  # panel size at a metal edge, um
+growth = 1.6  # size ratio of neighbouring panels away from an edge
+max_panel = 40
+near = 3  # exact potentials within near panel diagonals
+chunk = 1024  # rows of the potential matrix built at once
+cache_size = 64
+cache = cachetools.LRUCache(cache_size)
+
+
+def gap_region(component, layer=gap_layer):
+    return gf.kdb.Region(component.begin_shapes_rec(component.kcl.layer(*layer))).merged()
+
+
+def islands(component, centers=None, layer=gap_layer):
+    # floating metal enclosed by the gaps (kdb polygons, dbu): the ones containing centers (um), by default
+    # the ones a junction patch lands on, i.e. the xmon islands, ordered along y then x
+    holes = gf.kdb.Region()
+    for polygon in gap_region(component, layer).each():
+        for i in range(polygon.holes()):
+            holes.insert(gf.kdb.Polygon(list(polygon.each_point_hole(i))))
+    if centers is None:
+        junctions = gf.kdb.Region(component.begin_shapes_rec(component.kcl.layer(*junction_layer)))
+        found = list(holes.interacting(junctions).each())
+        return sorted(found, key=lambda island: (island.bbox().center().y, island.bbox().center().x))
+    found = []
+    for x, y in centers:
+        point = gf.kdb.DPoint(x, y).to_itype(component.kcl.dbu)
+        matches = [island for island in holes.each() if island.inside(point)]
+        if not matches:
+            raise ValueError(f'no island enclosed by the {layer} gaps at ({x}, {y})')
+        found.append(matches[0])
+    return found
+
+
+def conductors(gaps, window):
+    # connected metal in the window (kdb regions, dbu), ground (the largest part) first
+    metal = (gf.kdb.Region(window) - (gaps & gf.kdb.Region(window))).merged()
+    return [gf.kdb.Region(part) for part in sorted(metal.each(), key=lambda part: -part.area())]
+
+
+def grading(length, refine_start, refine_stop):
+    # panel edges over [0, length]: panel wide at a refined end, growing by growth per panel up to max_panel
+    # the size grows linearly with the distance d from the end, so the panel count out to d is
+    # log(1 + k d/panel)/k with k = growth - 1, and max_panel a panel beyond reach
+    k = growth - 1
+    reach = (max_panel - panel)/k
+    graded = np.log1p(k*reach/panel)/k
+
+    def count(d):
+        d = np.asarray(d, dtype=float)
+        return np.where(d < reach, np.log1p(k*np.minimum(d, reach)/panel)/k, graded + (d - reach)/max_panel)
+
+    def distance(s):
+        s = np.asarray(s, dtype=float)
+        return np.where(s < graded, np.expm1(k*np.minimum(s, graded))*panel/k, reach + (s - graded)*max_panel)
+
+    if refine_start and refine_stop:
+        total = 2*count(length/2)
+        s = total*np.arange(int(np.ceil(total)) + 1)/max(np.ceil(total), 1)
+        edges = np.where(s <= total/2, distance(s), length - distance(total - s))
+    elif refine_start or refine_stop:
+        total = count(length)
+        edges = distance(total*np.arange(int(np.ceil(total)) + 1)/max(np.ceil(total), 1))
+        if refine_stop:
+            edges = length - edges[::-1]
+    else:
+        edges = np.linspace(0, length, max(int(np.ceil(length/max_panel)), 1) + 1)
+    edges[0], edges[-1] = 0, length
+    return edges
+
+
+def mesh(parts, window, dbu):
+    # panels (x0, y0, x1, y1 in um) of every conductor and the index of the conductor they belong to
+    # each part is cut into trapezoids, taken as rectangles of the same height and mean width, and those into panels
+    # refined towards every side that lies on a metal edge, not on a cut between trapezoids or the window
+    panels, owners = [], []
+    for index, part in enumerate(parts):
+        edges = np.array([[e.p1.x, e.p1.y, e.p2.x, e.p2.y] for e in part.edges().each()], dtype=float)
+        x1, y1, x2, y2 = edges.T
+        on_window = ((x1 == x2) & np.isin(x1, [window.left, window.right])) | ((y1 == y2) & np.isin(y1, [window.bottom, window.top]))
+        edges = edges[~on_window]
+        horizontal = edges[edges[:, 1] == edges[:, 3]]
+        vertical = edges[edges[:, 0] == edges[:, 2]]
+
+        def on_edge(lines, position, low, high, axis):
+            # parts of [low, high] at position covered by a metal edge along the other axis
+            a, b = np.sort(lines[:, [1 - axis, 3 - axis]], axis=1).T
+            return bool(np.any((lines[:, axis] == position) & (np.minimum(b, high) - np.maximum(a, low) > 0)))
+
+        for trapezoid in part.decompose_trapezoids_to_region(gf.kdb.Polygon.TD_htrapezoids).each():
+            points = np.array([[p.x, p.y] for p in trapezoid.each_point_hull()], dtype=float)
+            bottom, top = points[:, 1].min(), points[:, 1].max()
+            low, high = points[points[:, 1] == bottom, 0], points[points[:, 1] == top, 0]
+            left, right = (low.min() + high.min())/2, (low.max() + high.max())/2
+            refine = (
+                low.min() != high.min() or on_edge(vertical, left, bottom, top, 0),
+                on_edge(horizontal, bottom, left, right, 1),
+                low.max() != high.max() or on_edge(vertical, right, bottom, top, 0),
+                on_edge(horizontal, top, left, right, 1),
+            )
+            xs = left*dbu + grading((right - left)*dbu, refine[0], refine[2])
+            ys = bottom*dbu + grading((top - bottom)*dbu, refine[1], refine[3])
+            x0, y0 = np.meshgrid(xs[:-1], ys[:-1])
+            x1, y1 = np.meshgrid(xs[1:], ys[1:])
+            panels.append(np.stack([x0.ravel(), y0.ravel(), x1.ravel(), y1.ravel()], axis=1))
+            owners.append(np.full(x0.size, index))
+    return np.concatenate(panels), np.concatenate(owners)
+
+
+def corner(u, v):
+    # antiderivative of 1/r over the plane, u asinh(v/|u|) + v asinh(u/|v|), zero on the axes
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(u != 0, u*np.arcsinh(v/np.abs(u)), 0) + np.where(v != 0, v*np.arcsinh(u/np.abs(v)), 0)
+
+
+def rectangle_potential(x, y, x0, y0, x1, y1):
+    # integral of 1/r over the rectangle seen from (x, y) in its plane, um
+    return corner(x1 - x, y1 - y) - corner(x0 - x, y1 - y) - corner(x1 - x, y0 - y) + corner(x0 - x, y0 - y)
+
+
+def potential_matrix(panels):
+    # P[i, j]: potential at the centre of panel i of a unit charge density on panel j, V/(C/m^2)
+    x0, y0, x1, y1 = panels.T
+    cx, cy = (x0 + x1)/2, (y0 + y1)/2
+    area = (x1 - x0)*(y1 - y0)
+    size = np.hypot(x1 - x0, y1 - y0)
+    P = np.empty((len(panels), len(panels)))
+    for start in range(0, len(panels), chunk):
+        rows = slice(start, start + chunk)
+        r = np.hypot(cx[rows, np.newaxis] - cx, cy[rows, np.newaxis] - cy)
+        i, j = np.nonzero(r < near*size)
+        with np.errstate(divide='ignore'):
+            block = area/r
+        block[i, j] = rectangle_potential(cx[rows][i], cy[rows][i], x0[j], y0[j], x1[j], y1[j])
+        P[rows] = block
+    return P*1e-6/(4*np.pi*epsilon_0*epsilon_eff)
+
+
+def extract(component, centers=None, window=None, layer=gap_layer):
+    # Maxwell capacitance matrix of the conductors around the islands (see islands()), cached on the cell hash
+    # window: (x0, y0, x1, y1) in um, default the islands grown by margin
+    # returns (matrix over the conductors but ground, conductors with ground first, matrix index of each island)
+    key = (component.hash(), None if centers is None else tuple(map(tuple, centers)), window, layer, margin, panel, growth, max_panel, near)
+    if key in cache:
+        return cache[key]
+    dbu = component.kcl.dbu
+    found = islands(component, centers, layer)
+    if not found:
+        raise ValueError(f'no island enclosed by the {layer} gaps touches a junction patch on {junction_layer}, pass centers')
+    if window is None:
+        box = gf.kdb.Box()
+        for island in found:
+            box += island.bbox()
+        box = box.enlarged(round(margin/dbu))
+    else:
+        box = gf.kdb.DBox(*window).to_itype(dbu)
+    parts = conductors(gap_region(component, layer), box)
+    panels, owners = mesh(parts, box, dbu)
+    nets = len(parts) - 1
+    # one solve per net at 1 V, everything else (ground included) at 0 V
+    charge = np.linalg.solve(potential_matrix(panels), (owners[:, np.newaxis] == np.arange(1, nets + 1)).astype(float))
+    charge *= ((panels[:, 2] - panels[:, 0])*(panels[:, 3] - panels[:, 1])*1e-12)[:, np.newaxis]
+    matrix = np.array([charge[owners == net].sum(axis=0) for net in range(1, nets + 1)])
+    matrix = (matrix + matrix.T)/2
+    nets_of = []
+    for island in found:
+        point = island.bbox().center()
+        nets_of.append(next(i - 1 for i, part in enumerate(parts) if i > 0 and any(p.inside(point) for p in part.each())))
+    cache[key] = matrix, parts, nets_of
+    return cache[key]
+
+
+def qudit_capacitances(component, centers=None, window=None, layer=gap_layer):
+    # c_q: total capacitance of each island, the c_q of circuit.py; c_g: to its readout claw, taken as the largest
+    # coupling to a net that is neither ground nor another island; c_c: between neighbouring islands; arrays in F
+    matrix, parts, nets = extract(component, centers, window, layer)
+    others = [net for net in range(len(matrix)) if net not in nets]
+    c_g = [max((-matrix[net, other] for other in others), default=0.0) for net in nets]
+    return dict(
+        c_q=matrix[nets, nets],
+        c_g=np.array(c_g),
+        c_c=np.array([-matrix[a, b] for a, b in zip(nets[:-1], nets[1:])]),
+    )
+
+
+def clear_cache():
+    cache.clear()
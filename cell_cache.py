@@ -0,0 +1,236 @@
+import functools
+import hashlib
+import inspect
+import json
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import cachetools
+import gdsfactory as gf
+import numpy as np
+
+# on-disk cache of built sub-cells, shared by every process that imports the layout modules
+# set QUDIT_CELL_CACHE=0 to always rebuild from scratch
+package_dir = Path(__file__).resolve().parent
+cache_dir = package_dir / 'build' / 'cache'
+cache_enabled = os.environ.get('QUDIT_CELL_CACHE', '1') != '0'
+cache_suffix = '.oas'
+max_entries = 512
+max_bytes = 2 * 1024**3
+# in-process memo of small leaf cells (JJ, xmon): float parameters snapped to memo_resolution um
+memo_resolution = 1e-3
+memo_size = 256
+memo_caches = {}
+
+
+def configure(directory=None, enabled=None, entries=None, size=None):
+    global cache_dir, cache_enabled, max_entries, max_bytes
+    if directory is not None:
+        cache_dir = Path(directory)
+    if enabled is not None:
+        cache_enabled = enabled
+    if entries is not None:
+        max_entries = entries
+    if size is not None:
+        max_bytes = size
+
+
+def canonical(value):
+    # floats are keyed at 1 pm so that 0.65 and 0.6500000001 hit the same cell
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [canonical(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): canonical(v) for k, v in sorted(value.items())}
+    return value
+
+
+def param_hash(name, params, salt=''):
+    payload = json.dumps([name, canonical(params), salt], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:20]
+
+
+@functools.lru_cache(maxsize=None)
+def source_hash(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def layout_hash(module):
+    # sources of the module and of every module of this package it reaches through its globals (imported
+    # modules, functions, classes), cell_cache included, so a change to any helper a cell is drawn with counts
+    seen = {}
+    todo = [importlib.import_module(module)]
+    while todo:
+        current = todo.pop()
+        path = getattr(current, '__file__', None)
+        if path is None or Path(path).resolve().parent != package_dir or path in seen:
+            continue
+        seen[path] = source_hash(path)
+        for value in vars(current).values():
+            if inspect.ismodule(value):
+                todo.append(value)
+            elif isinstance(getattr(value, '__module__', None), str) and value.__module__ in sys.modules:
+                todo.append(sys.modules[value.__module__])
+    return hashlib.sha256(json.dumps(sorted((Path(path).name, digest) for path, digest in seen.items())).encode()).hexdigest()
+
+
+def cache_entries():
+    if not cache_dir.exists():
+        return []
+    files = [p for p in cache_dir.glob('*' + cache_suffix) if not p.name.startswith('.')]
+    return sorted(files, key=lambda p: p.stat().st_mtime)
+
+
+def evict():
+    # least recently used first, a cache hit touches the file
+    files = cache_entries()
+    total = sum(p.stat().st_size for p in files)
+    while files and (len(files) > max_entries or total > max_bytes):
+        oldest = files.pop(0)
+        total -= oldest.stat().st_size
+        oldest.unlink(missing_ok=True)
+
+
+def clear_cache():
+    for p in cache_entries():
+        p.unlink(missing_ok=True)
+
+
+def write_atomic(component, path):
+    # sweep workers share the directory, never expose a half written file
+    # sub-cells are kept as references, pads are renamed after their file by get_pad so the names are unique
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'.{path.stem}.{os.getpid()}{path.suffix}')
+    component.write_gds(tmp)
+    os.replace(tmp, path)
+
+
+def read_cell(path):
+    # gf.read.import_gds hands the ports over with the layer index of its temporary layout, which is another
+    # layer in gf.kcl (a port on (5,0) comes back on WAFER and routing to it fails), so they are put back
+    # on the layers cached_cell recorded in the cell info when it wrote the file
+    c = gf.read.import_gds(path)
+    for port in c.ports:
+        if port.name in c.info.get('port_layers', {}):
+            port.layer = gf.kcl.layer(*c.info['port_layers'][port.name])
+    return c
+
+
+def cached_cell(func=None, depends=None):
+    # gf.cell keeps the built cell for the rest of the process, the disk cache keeps it across runs
+    # the key is the function name, its bound parameters and the sources of the defining module and the
+    # layout modules it imports (layout_hash), so editing the layout code invalidates everything it built
+    # depends: optional callable returning the state of files the cell reads (e.g. pads.library_stamp)
+    if func is None:
+        return functools.partial(cached_cell, depends=depends)
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def build(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        params = dict(bound.arguments)
+        if not cache_enabled:
+            return func(**params)
+
+        # hashed on the first build, once the defining module has finished importing
+        key = param_hash(func.__qualname__, params, [layout_hash(func.__module__), depends() if depends else None])
+        path = cache_dir / f'{func.__name__}_{key}{cache_suffix}'
+        # not cached, or evicted by another sweep process between utime and the read: built again below
+        try:
+            os.utime(path)
+            return read_cell(path)
+        except FileNotFoundError:
+            pass
+        except RuntimeError:
+            # KLayout reports a file that is gone by the time it opens it as a RuntimeError
+            if path.exists():
+                raise
+
+        c = func(**params)
+        if not c._locked:
+            c.name = f'{func.__name__}_{key}'
+            layers = {port.name: gf.kcl.get_info(port.layer) for port in c.ports}
+            c.info['port_layers'] = {name: [info.layer, info.datatype] for name, info in layers.items()}
+        write_atomic(c, path)
+        evict()
+        return c
+
+    return gf.cell(build)
+
+
+class MemoCache(cachetools.LRUCache):
+    # the cache gf.cell looks cells up in, bounded and counting hits and misses
+    def __init__(self, maxsize):
+        super().__init__(maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    def __getitem__(self, key):
+        try:
+            value = super().__getitem__(key)
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        return value
+
+    def popitem(self):
+        # eviction reads the entry through __getitem__, that is not a lookup
+        hits = self.hits
+        item = super().popitem()
+        self.hits = hits
+        return item
+
+    def __bool__(self):
+        # kfactory replaces a falsy (empty) cache with its own
+        return True
+
+
+def snap(value, resolution):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        return round(round(value/resolution)*resolution, 9)
+    return value
+
+
+def memo_cell(func=None, maxsize=None, resolution=None, basename=None):
+    # gf.cell with a bounded LRU cache, for cells that are cheap to store but rebuilt many times
+    # floats are snapped to resolution before the call, so parameters equal at 1 nm share one cell
+    # and the cell is drawn from the snapped values whichever caller built it first
+    if func is None:
+        return functools.partial(memo_cell, maxsize=maxsize, resolution=resolution, basename=basename)
+    signature = inspect.signature(func)
+    resolution = resolution or memo_resolution
+    cache = MemoCache(maxsize or memo_size)
+    memo_caches[f'{func.__module__}.{basename or func.__name__}'] = cache
+    cell = gf.cell(func, cache=cache, basename=basename)
+
+    @functools.wraps(func)
+    def build(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return cell(**{name: snap(value, resolution) for name, value in bound.arguments.items()})
+
+    build.cache = cache
+    return build
+
+
+def memo_stats():
+    return {
+        name: dict(hits=cache.hits, misses=cache.misses, size=len(cache), maxsize=cache.maxsize)
+        for name, cache in memo_caches.items()
+    }
+
+
+def clear_memo():
+    for cache in memo_caches.values():
+        cache.clear()
+        cache.hits = cache.misses = 0
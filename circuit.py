@@ -0,0 +1,134 @@
+import numpy as np
+
+# circuit parameters of the xmon + readout resonator, the formulas of physics.ipynb
+# every function broadcasts over NumPy arrays, so whole batches of designs are evaluated at once
+h_bar = 1.0545718e-34  # Planck constant over 2pi in Js
+e = 1.60217662e-19  # Elementary charge in C
+h = h_bar * 2 * np.pi
+phi_0 = h/(2*e)
+Zr = 50  # Ohm, characteristic impedance of the resonator
+q_ext = 11502
+J_c = 0.5e-6  # critical current density in A/um^2
+jj_length = 0.2  # um
+
+
+def calculate_cr(frequency, impedance=Zr):
+    L = impedance / (2 * np.pi * frequency)
+    C = 1 / (4 * np.pi**2 * frequency**2 * L)
+    return L, C
+
+
+def charging_energy(c_q):
+    return e**2 / (2*c_q)
+
+
+def calculate_Ej(Ec, qubit_frequency):
+    return ((qubit_frequency*h) + Ec)**2/(8*Ec)
+
+
+def calculate_qubit_f(Ej, Ec):
+    return (np.sqrt(8*Ej*Ec)-Ec)/h
+
+
+def coupling_strength(Cg, Cq, Cr, resonator_f):
+    return 1/2 * resonator_f * Cg/np.sqrt((Cq+Cg)*(Cg+Cr))
+
+
+def dispersive_shift(g, delta, alpha):
+    return -g**2/delta*(1/(1+delta/alpha))
+
+
+def calculate_jj_width(Ej, J_c=J_c, jj_length=jj_length):
+    I_c = Ej*2*np.pi/phi_0
+    jj_area = I_c/J_c
+    return jj_area/jj_length
+
+
+def calculate_Ej_from_width(jj_width, J_c=J_c, jj_length=jj_length):
+    Ic = J_c*jj_length*jj_width
+    return Ic*phi_0/(2*np.pi)
+
+
+# a batch of designs, one row per candidate
+design_dtype = np.dtype([
+    ('qubit_f', 'f8'),
+    ('c_g', 'f8'),
+    ('c_q', 'f8'),
+    ('resonator_f', 'f8'),
+    ('q_ext', 'f8'),
+])
+
+params_fields = (
+    'delta', 'c_r', 'E_c', 'E_j', 'alpha', 'Ej_Ec', 'I_c', 'jj_width',
+    'g', 'chi', 'kappa', 'T1_purcell_limit', 'T1_purcell', 'N_level',
+)
+params_dtype = np.dtype(design_dtype.descr + [(name, 'f8') for name in params_fields])
+
+
+def calculate_params(qubit_f, c_g, c_q=1.647e-13, resonator_f=6.7e9, q_ext=q_ext):
+    # same quantities and units as calculate_params in physics.ipynb:
+    # energies in J, frequencies, g, chi and kappa in Hz, alpha in rad/s, jj_width in um per junction
+    delta = resonator_f - qubit_f
+    r_L, c_r = calculate_cr(resonator_f)
+    E_c = charging_energy(c_q)
+    alpha = E_c/h_bar
+    E_j = calculate_Ej(E_c, qubit_f)
+    g = coupling_strength(c_g, c_q, c_r, resonator_f)
+    chi = dispersive_shift(g, delta, alpha)
+
+    I_c = E_j*2*np.pi/phi_0
+    # the SQUID splits E_j over its two junctions
+    jj_width = calculate_jj_width(E_j)/2
+
+    kappa = resonator_f / q_ext
+    return dict(
+        delta=delta,
+        c_r=c_r,
+        E_c=E_c,
+        E_j=E_j,
+        alpha=alpha,
+        Ej_Ec=E_j/E_c,
+        I_c=I_c,
+        jj_width=jj_width,
+        g=g,
+        chi=chi,
+        kappa=kappa,
+        T1_purcell_limit=2 * alpha / kappa**2 * (2 * np.pi),
+        T1_purcell=delta**2 / (kappa * g**2),
+        N_level=2*E_j/np.sqrt(8*E_j*E_c),
+    )
+
+
+def designs(qubit_f, c_g, c_q=1.647e-13, resonator_f=6.7e9, q_ext=q_ext):
+    # broadcast the inputs into a structured design array
+    columns = np.broadcast_arrays(qubit_f, c_g, c_q, resonator_f, q_ext)
+    batch = np.empty(columns[0].shape, dtype=design_dtype)
+    for name, column in zip(design_dtype.names, columns):
+        batch[name] = column
+    return batch
+
+
+def evaluate(batch):
+    # structured array of designs in, structured array of designs and derived parameters out
+    params = calculate_params(**{name: batch[name] for name in design_dtype.names})
+    out = np.empty(batch.shape, dtype=params_dtype)
+    for name in design_dtype.names:
+        out[name] = batch[name]
+    for name in params_fields:
+        out[name] = params[name]
+    return out
+
+
+def print_params(params):
+    # the printout of physics.ipynb for one design
+    E_j, E_c = params['E_j'], params['E_c']
+    print(f"qubit frequency: {calculate_qubit_f(E_j, E_c)/1e9} GHz")
+    print(f"alpha: {params['alpha'] / 2 / np.pi / 1e6} * 2pi MHz")
+    print(f'E_j/h = {E_j/h/1e9}')
+    print(f'E_c/h = {E_c/h/1e9}')
+    print(f"E_j/E_c = {params['Ej_Ec']}")
+    print(f"jj_width: {params['jj_width']} um")
+    print(f"g: {np.round(params['g']/1e6,2)}e6")
+    print(f"dispersive_shift: {params['chi']/1e6} MHz")
+    print(f"T1 Purcell limit: {params['T1_purcell_limit']} s")
+    print(f"N_level = {params['N_level']}")
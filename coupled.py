@@ -1,9 +1,12 @@
 import gdsfactory as gf
 import matplotlib.pyplot as plt
 import numpy as np
+import time
 from gdsfactory.generic_tech import LAYER
 from gdsfactory.generic_tech import get_generic_pdk
 from gdsfactory.cross_section import ComponentAlongPath
+from air_bridges import air_bridge
+import telemetry
 import warnings
 ignore = True
 if ignore:
@@ -117,9 +120,6 @@ def resonator(epsilon_eff, frequency = 6.7e9, length = 300, radius = 30, air_bri
     resonator_length_theory = calculate_resonator_length(epsilon_eff, frequency)*1e6
     number_of_cycle = 5
     Path = create_resonator(length, radius, number_of_cycle)
-    Path_length = Path.length() + top_connector_depth
-    print(f'Path length: {Path_length} um')
-    print('resonator_frequency: ', f'{np.round(calculate_resonator_frequency(epsilon_eff, Path_length*1e-6)/1e9,3)} GHz' )
 
     resonator_width = 10
     tunnel_width = 6
@@ -133,7 +133,16 @@ def resonator(epsilon_eff, frequency = 6.7e9, length = 300, radius = 30, air_bri
 
     x = gf.CrossSection(sections=[s1, s2], components_along_path=[via])
 
+    start = time.perf_counter()
     c = gf.path.extrude(Path, cross_section=x)
+    # coupled.py has no cell cache, every call builds and reports
+    if telemetry.enabled:
+        Path_length = Path.length() + top_connector_depth
+        telemetry.emit(
+            'resonator', module=__name__, length=length, radius=radius, number_of_cycle=number_of_cycle,
+            path_length=float(Path_length), frequency=float(calculate_resonator_frequency(epsilon_eff, Path_length*1e-6)),
+            extrude_time=time.perf_counter() - start,
+        )
     return c 
 
 def resonator_airbridge(epsilon_eff, frequency = 6.7e9, length = 300, radius = 30, air_bridge_flag = True, top_connector_depth = 80, air_bridge_spacing = 400):
@@ -160,69 +169,6 @@ def resonator_airbridge(epsilon_eff, frequency = 6.7e9, length = 300, radius = 3
     return c 
 
 
-@gf.cell
-def air_bridge(xvr_length):
-
-    if xvr_length >=5 and xvr_length <=16:
-        xvr_width = 5
-    elif xvr_length > 16 and xvr_length <= 27:
-        xvr_width = 7.5
-    elif xvr_length > 27 and xvr_length <= 32:
-        xvr_width = 10
-    else:
-        raise Exception('xvr length is greater than 32')
-
-
-    if xvr_length >=5 and xvr_length <=16:
-        RR_length = 8
-    elif xvr_length > 16 and xvr_length <= 27:
-        RR_length = 10
-    elif xvr_length > 27 and xvr_length <= 32:
-        RR_length = 14 
-
-    
-    RR_width = xvr_width + 3
-    Tether_width = RR_width + 2*1.5
-    Tether_length = RR_length+2*1.5
-    Tether_offset = (Tether_width - xvr_width)/2
-
-    r3 = gf.kdb.DPolygon([(1.5, 1.5), (RR_length+1.5, 1.5), (RR_length+1.5, RR_width+1.5), (1.5, RR_width+1.5)])
-    r4 = gf.kdb.DPolygon([(Tether_length+xvr_length+1.5, 1.5), (Tether_length+xvr_length+1.5+RR_length, 1.5), 
-                          (Tether_length+xvr_length+1.5+RR_length, Tether_width-1.5), (Tether_length+xvr_length+1.5, Tether_width-1.5)])
-    p_middle = gf.kdb.DPolygon([(Tether_length, Tether_offset), (Tether_length+xvr_length, Tether_offset), (Tether_length+xvr_length, Tether_width-Tether_offset), (Tether_length, Tether_width-Tether_offset)])
-    p_left = r3.sized(1.5)
-    p_right = r4.sized(1.5)
-
-
-    left_canvas = gf.Component()
-    right_canvas = gf.Component()
-    mid_canvas = gf.Component()
-    left_canvas.add_polygon(p_left, layer=(31, 0))
-    right_canvas.add_polygon(p_right, layer=(31, 0))
-    mid_canvas.add_polygon(p_middle, layer=(31, 0))
-
-    c = gf.Component()
-    left_ref = c << left_canvas
-    right_ref = c << right_canvas
-    mid_ref = c << mid_canvas
-
-    c.add_polygon(r3, layer=(30, 0))
-    c.add_polygon(r4, layer=(30, 0))
-    c.flatten()
-
-    rotated = gf.Component()
-    qudit_ref = rotated << c
-    qudit_ref.drotate(90)
-    rotated.flatten()
-
-    d = gf.Component()
-    air_bridge_ref = d << rotated
-    air_bridge_ref.dmovex(0-air_bridge_ref.dx)
-    air_bridge_ref.dmovey(0-air_bridge_ref.dy)
-    d.flatten()
-
-    return d
-
 @gf.cell
 def qubit_resonator(xmon_spacing=20,
                     xmon_width = 40,
@@ -277,7 +223,7 @@ def qubit_resonator(xmon_spacing=20,
     remain = gf.boolean(top_ref, rec_ref, '-', layer=(5,0))
     remain_ref = canvas_qubit << remain
 
-    canvas_qubit.flatten(merge=True)
+    # the resonator and its air bridges stay references, (5,0) is merged when the chip is written
     return canvas_qubit
 
 qubit = qubit_resonator()
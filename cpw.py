@@ -0,0 +1,55 @@
+import functools
+
+import gdsfactory as gf
+from gdsfactory.cross_section import ComponentAlongPath
+
+from profiler import profiled
+from resonator_model import euler_npoints
+
+
+def cpw_cross_section(width, gap, layer=(5,0), bridge=None, bridge_spacing=100, bridge_padding=2):
+    # the two gap strips of a coplanar waveguide, same construction as the s1/s2 sections in resonator()
+    # the centre conductor is hidden, it only carries the ports for routing
+    center = gf.Section(width=width, offset=0, layer=layer, port_names=('o1', 'o2'), hidden=True)
+    s1 = gf.Section(width=gap, offset=width/2 + gap/2, layer=layer)
+    s2 = gf.Section(width=gap, offset=-(width/2 + gap/2), layer=layer)
+    if bridge is None:
+        return gf.CrossSection(sections=[center, s1, s2])
+    via = ComponentAlongPath(
+        component=bridge, spacing=bridge_spacing, padding=bridge_padding, offset=0,
+    )
+    return gf.CrossSection(sections=[center, s1, s2], components_along_path=[via])
+
+
+@profiled(name='route')
+def cpw_route(port1, port2, width, gap, radius, steps=None, layer=(5,0), bridge=None, bridge_spacing=100, bridge_padding=2, allow_width_mismatch=True, max_sagitta=None):
+    # routes once and returns the gaps and air bridges, replacing the inner/outer/bridge routes and the A-B boolean
+    # max_sagitta: bends drawn with the fewest points keeping the outer gap edge within it (database units of write()),
+    # None keeps the gdsfactory point spacing
+    line = gf.Component()
+    xs = cpw_cross_section(width, gap, layer=layer, bridge=bridge, bridge_spacing=bridge_spacing, bridge_padding=bridge_padding)
+    bend = {}
+    if max_sagitta is not None:
+        bend['bend'] = functools.partial(gf.components.bend_euler, npoints=euler_npoints(radius, 90, max_sagitta, offset=width/2 + gap))
+    if steps is None:
+        gf.routing.route_single(
+            line,
+            port1 = port1,
+            port2 = port2,
+            allow_width_mismatch = allow_width_mismatch,
+            cross_section = xs,
+            radius = radius,
+            **bend,
+        )
+    else:
+        gf.routing.route_single_from_steps(
+            line,
+            port1 = port1,
+            port2 = port2,
+            allow_width_mismatch = allow_width_mismatch,
+            cross_section = xs,
+            steps = steps,
+            radius = radius,
+            **bend,
+        )
+    return line
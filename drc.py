@@ -0,0 +1,121 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import gdsfactory as gf
+import yaml
+from klayout import rdb
+
+from profiler import profiled
+
+# geometric DRC of a built component against a YAML rule deck (drc_rules.yaml), with KLayout Region checks
+# layers are flattened and merged once, then every rule runs in its own thread (the checks run in C++)
+package_dir = Path(__file__).parent
+deck_path = package_dir / 'drc_rules.yaml'
+default_threads = os.cpu_count() or 1
+# edges meeting at this angle or more are not checked against each other (KLayout's default), a rule can
+# set its own angle_limit in the deck
+default_angle_limit = 90
+checks = ('width', 'space', 'separation', 'enclosing', 'inside')
+
+
+def load_deck(path=None):
+    with open(path or deck_path) as f:
+        deck = yaml.safe_load(f)['rules']
+    for rule in deck:
+        if rule['check'] not in checks:
+            raise ValueError(f"rule {rule['name']!r}: check {rule['check']!r} is not one of {checks}")
+        if rule['check'] in ('separation', 'enclosing', 'inside') and 'other' not in rule:
+            raise ValueError(f"rule {rule['name']!r}: check {rule['check']!r} needs an other layer")
+    return deck
+
+
+def deck_layers(deck):
+    layers = set()
+    for rule in deck:
+        layers.add(tuple(rule['layer']))
+        if 'other' in rule:
+            layers.add(tuple(rule['other']))
+    return sorted(layers)
+
+
+def merged_region(component, layer):
+    region = gf.kdb.Region(component.begin_shapes_rec(component.kcl.layer(*layer)))
+    region.merge()
+    return region
+
+
+def check_rule(rule, regions, dbu):
+    # edge pairs (or polygons for inside) marking every violation of the rule
+    region = regions[tuple(rule['layer'])]
+    distance = round(rule.get('value', 0)/dbu)
+    options = (False, gf.kdb.Metrics.Euclidian, rule.get('angle_limit', default_angle_limit))
+    if rule['check'] == 'width':
+        return region.width_check(distance, *options)
+    if rule['check'] == 'space':
+        return region.space_check(distance, *options)
+    other = regions[tuple(rule['other'])]
+    if rule['check'] == 'separation':
+        return region.separation_check(other, distance, *options)
+    if rule['check'] == 'enclosing':
+        return region.enclosing_check(other, distance, *options)
+    return region - other
+
+
+def cell_region(component, names):
+    # the boxes of every instance of the named cells, grown by one database unit so markers on their edge count
+    region = gf.kdb.Region()
+    instances = gf.kdb.RecursiveInstanceIterator(component.kcl.layout, component._kdb_cell)
+    while not instances.at_end():
+        cell = instances.inst_cell()
+        if cell.name in names:
+            region.insert(cell.bbox().transformed(instances.trans() * instances.inst_trans()).enlarged(1))
+        instances.next()
+    return region
+
+
+@profiled
+def check(component, deck=None, threads=None):
+    # {rule name: markers}, less the ones inside the cells a rule waives, or only those inside its cells
+    deck = deck or load_deck()
+    if threads is None:
+        threads = default_threads
+    layers = deck_layers(deck)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        regions = dict(zip(layers, pool.map(lambda layer: merged_region(component, layer), layers)))
+        markers = dict(zip([rule['name'] for rule in deck], pool.map(lambda rule: check_rule(rule, regions, component.kcl.dbu), deck)))
+    for rule in deck:
+        if rule.get('waive'):
+            markers[rule['name']] = markers[rule['name']].not_inside(cell_region(component, rule['waive']))
+        if rule.get('cells'):
+            markers[rule['name']] = markers[rule['name']].inside(cell_region(component, rule['cells']))
+    return markers
+
+
+def marker_database(component, deck, markers):
+    # one category per rule, markers in um, opens in the KLayout marker browser
+    database = rdb.ReportDatabase('DRC')
+    database.generator = 'drc.py'
+    database.top_cell_name = component.name
+    cell = database.create_cell(component.name)
+    trans = gf.kdb.CplxTrans(component.kcl.dbu)
+    for rule in deck:
+        category = database.create_category(rule['name'])
+        category.description = rule.get('description', '')
+        database.create_items(cell.rdb_id(), category.rdb_id(), trans, markers[rule['name']])
+    return database
+
+
+def run_drc(component, deck=None, report=None, threads=None):
+    # {rule name: number of violations}, the marker database is written to report (.lyrdb) when given
+    # run it before write(): the DRC output removes (5,0) from the component
+    deck = deck or load_deck()
+    markers = check(component, deck, threads)
+    if report is not None:
+        marker_database(component, deck, markers).save(str(report))
+    return {name: marker.count() for name, marker in markers.items()}
+
+
+def print_violations(counts):
+    for name, count in counts.items():
+        print(f"{name:<28}{'ok' if count == 0 else count}")
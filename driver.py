@@ -1,6 +1,7 @@
 from qudit import *
 import pya
-from kfactory.kcell import cell, save_layout_options
+from kfactory.kcell import cell
+from export import write
 qubit = qubit(
         xmon_length = 420,
         xmon_width = 40, 
@@ -74,31 +75,7 @@ qubit = qubit(
 # final << extracted 
 # final.flatten(merge=True)
 # final.show()
-def write(qubit, is_DRC=True):
-        options = save_layout_options()
-        options.dbu = 0.0005
-        if not is_DRC:
-                qubit.flatten(merge=True)
-                qubit.name = 'qudit'
-                qubit.show()
-                # qubit.write_gds('/Users/qiyu/Documents/gds-folder/QUDIT_6GHz.gds', save_options=options)
-                return
-        final = gf.Component()
-        layer5 = qubit.extract( layers=((5,0),) )
-
-        rectangle = gf.components.rectangle(size=(5000, 5000), layer=(5,0), centered=True)
-        diff = gf.boolean(rectangle, layer5, 'A-B', layer1=(5,0), layer2=(5,0), layer=(100,0))
-        diff.name = 'diff'
-        removed = qubit.remove_layers(layers=((5,0),))
-        extracted = diff.extract(layers=((100,0),))
-        remap = extracted.remap_layers({(100, 0):(5,0)})
-
-        final << qubit
-        final << remap 
-        final.flatten(merge=True)
-        final.name = 'qudit'
-        final.show()
-        # final.write_gds('/Users/qiyu/Documents/gds-folder/QUDIT_6GHz.gds', save_options=options)
 
 
+# write(qubit, is_DRC=True, gdspath='/Users/qiyu/Documents/gds-folder/QUDIT_6GHz.gds')
 write(qubit, is_DRC=True)
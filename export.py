@@ -0,0 +1,177 @@
+import os
+
+import gdsfactory as gf
+from kfactory.kcell import KCLayout, save_layout_options
+
+from profiler import profiled, span
+from stream_writer import open_writer
+
+die_size = 5000
+# ground plane inversion: the die is cut into default_tiles pieces, processed by default_threads workers of
+# KLayout's TilingProcessor (its threads run in C++, a Python thread pool would run the booleans one at a time:
+# every KLayout call holds the GIL)
+default_tiles = (4, 4)
+default_threads = os.cpu_count() or 1
+# layers merged (and drawn flat into the top cell) by the hierarchical output, everything else stays in its cell
+# () keeps the non-DRC output fully hierarchical, the DRC output always merges (5,0) into the ground plane
+merged_layers = ((5,0),)
+
+
+def layout_options():
+    options = save_layout_options()
+    options.dbu = 0.0005
+    return options
+
+
+def polygon_counts(component):
+    # merged polygon count per layer of the flattened component
+    counts = {}
+    for layer_index in component.kcl.layer_indexes():
+        region = gf.kdb.Region(component.begin_shapes_rec(layer_index))
+        if region.is_empty():
+            continue
+        info = component.kcl.get_info(layer_index)
+        counts[f'{info.layer}/{info.datatype}'] = region.count()
+    return counts
+
+
+def die_box(kcl):
+    half = round(die_size/2/kcl.dbu)
+    return gf.kdb.Box(-half, -half, half, half)
+
+
+@profiled(name='ground_plane')
+def invert(region, box, tiles=None, threads=None):
+    # box minus region, tile by tile: each tile only sees the shapes it touches
+    # where a slanted edge crosses a tile line the tiles meet within half a database unit of the one-shot boolean
+    # on a single thread the one-shot boolean is faster (tiling costs 1.7x the work), it is used there
+    if tiles is None:
+        tiles = default_tiles
+    if threads is None:
+        threads = default_threads
+    if tiles == (1, 1) or threads == 1:
+        return gf.kdb.Region(box) - region
+    processor = gf.kdb.TilingProcessor()
+    processor.dbu = gf.kcl.dbu
+    processor.frame = box.to_dtype(gf.kcl.dbu)
+    processor.tiles(*tiles)
+    processor.threads = threads
+    processor.input('gaps', region)
+    output = gf.kdb.Region()
+    processor.output('ground', output)
+    processor.queue('_output(ground, _tile - gaps)')
+    processor.execute('ground plane')
+    output.merge()
+    return output
+
+
+@profiled
+def hierarchical_layout(qubit, is_DRC=True):
+    # the chip in a layout of its own with every sub-cell kept as a reference (air bridges, junctions, pads, resonators)
+    # only merged_layers are flattened and merged into the top cell, in DRC mode (5,0) becomes the ground plane
+    # the cells of qubit are copied, not modified
+    kcl = KCLayout(f'{qubit.name}_hierarchical')
+    kcl.layout.dbu = qubit.kcl.dbu
+    final = kcl.kcell('qudit')
+    final._kdb_cell.copy_tree(qubit._kdb_cell)
+    # settings and ports of the cached sub-cells would be written as context info
+    for cell in kcl.layout.each_cell():
+        cell.clear_meta_info()
+    layers = set(merged_layers) | ({(5,0)} if is_DRC else set())
+    for layer in sorted(layers):
+        region = gf.kdb.Region(qubit.begin_shapes_rec(qubit.kcl.layer(*layer)))
+        if is_DRC and layer == (5,0):
+            region = invert(region, die_box(qubit.kcl))
+        else:
+            region.merge()
+        layer_index = kcl.layout.layer(*layer)
+        kcl.layout.clear_layer(layer_index)
+        final.shapes(layer_index).insert(region)
+    return final
+
+
+@profiled
+def write(qubit, is_DRC=True, gdspath=None, show=True, hierarchical=False):
+    # hierarchical=True keeps the sub-cells as references and merges only merged_layers, see hierarchical_layout()
+    options = layout_options()
+    if hierarchical:
+        final = hierarchical_layout(qubit, is_DRC)
+    elif not is_DRC:
+        with span('flatten', qubit):
+            qubit.flatten(merge=True)
+        qubit.name = 'qudit'
+        final = qubit
+    else:
+        final = gf.Component()
+        layer5 = gf.kdb.Region(qubit.begin_shapes_rec(qubit.kcl.layer(5, 0)))
+
+        diff = gf.Component()
+        diff.add_polygon(invert(layer5, die_box(qubit.kcl)), layer=(5,0))
+        diff.name = 'diff'
+        # flatten first: a recursive remove_layers clears (5,0) from every cell in the layout,
+        # including the cached sub-cells the next build in this process would reuse
+        qubit.flatten()
+        qubit.remove_layers(layers=((5,0),), recursive=False)
+
+        final << qubit
+        final << diff
+        with span('flatten', final):
+            final.flatten(merge=True)
+        final.name = 'qudit'
+    if show:
+        final.show()
+    if gdspath is not None:
+        with span('write_gds'):
+            if hierarchical:
+                final.write(gdspath, save_options=options, set_meta_data=False)
+            else:
+                final.write_gds(gdspath, save_options=options)
+    return final
+
+
+def layer_regions(component, is_DRC=True):
+    # merged polygons of the chip one layer at a time, the component itself is left untouched
+    # in DRC mode (5,0) is the ground plane, the die minus the drawn metal gaps
+    kcl = component.kcl
+    for layer_index in kcl.layer_indexes():
+        info = kcl.get_info(layer_index)
+        layer = (info.layer, info.datatype)
+        region = gf.kdb.Region(component.begin_shapes_rec(layer_index))
+        if is_DRC and layer == (5,0):
+            region = invert(region, die_box(kcl))
+        if region.is_empty():
+            continue
+        region.merge()
+        yield layer, region
+
+
+def hull_points(polygon, max_points=None):
+    # hole free pieces of a polygon, none longer than max_points
+    if polygon.holes():
+        polygon = polygon.resolved_holes()
+    if max_points and polygon.num_points() > max_points:
+        for piece in polygon.split():
+            yield from hull_points(piece, max_points)
+        return
+    yield [(p.x, p.y) for p in polygon.each_point_hull()]
+
+
+@profiled
+def write_stream(qubit, path, is_DRC=True, compress=True):
+    # same chip as write(), but each layer is merged and written before the next one is read,
+    # so peak memory is the largest single layer instead of the flattened chip
+    # .oas writes OASIS (deflate compressed CBLOCKs unless compress=False), anything else GDSII
+    options = layout_options()
+    scale = gf.kdb.ICplxTrans(qubit.kcl.dbu/options.dbu)
+    writer = open_writer(path, dbu=options.dbu, compress=compress)
+    try:
+        writer.begin_cell('qudit')
+        for (layer, datatype), region in layer_regions(qubit, is_DRC=is_DRC):
+            with span(f'layer {layer}/{datatype}'):
+                for polygon in region.transformed(scale).each():
+                    for points in hull_points(polygon, writer.max_points):
+                        writer.polygon(layer, datatype, points)
+        writer.end_cell()
+    finally:
+        writer.close()
+    return path
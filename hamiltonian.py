@@ -0,0 +1,203 @@
+import importlib
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse import linalg
+
+import circuit
+import inverse_design
+import transmon
+from resonator_model import meander_frequency
+
+# coupled qudits and their readout resonators (the qudit_coupled layouts): a sparse Hamiltonian over the product
+# of truncated modes, dressed levels from shift-invert eigsh around the bare level of each state of interest
+# a mode is (energies, operator): levels in GHz from its ground state and the coupling operator normalized to
+# <0|O|1> = 1 (the charge of a qudit, a + a^dag of a resonator); a coupling g (GHz) adds g O_i O_j
+qudit_levels = 4
+resonator_levels = 3
+eigenvalues = 4  # eigenpairs per shift-invert solve, the one overlapping the bare state most is kept
+# layout_system parameters that change the drawn chip C_c is extracted from
+drawn_params = ('xmon_length', 'xmon_width', 'xmon_spacing', 'top_connector_depth', 'readout_tunnel_width', 'readout_connector_metal_spacing')
+
+
+def qudit_mode(E_j, E_c, d=qudit_levels):
+    # exact levels and charge matrix elements of transmon.py
+    energies = transmon.levels(E_j, E_c, d=d)/circuit.h/1e9
+    n = transmon.charge_elements(E_j, E_c, d=d)
+    return energies, n/abs(n[0, 1])
+
+
+def resonator_mode(frequency, d=resonator_levels):
+    k = np.arange(d)
+    a = np.diag(np.sqrt(k[1:]), 1)
+    return k*frequency/1e9, a + a.T
+
+
+def hamiltonian(modes, couplings):
+    # couplings: {(i, j): g in GHz} between modes i and j, in GHz
+    dims = [len(energies) for energies, _ in modes]
+
+    def embed(operators):
+        # kron over all modes, identity where no operator is given
+        out = sparse.identity(1, format='csr')
+        for i, dim in enumerate(dims):
+            out = sparse.kron(out, operators.get(i, sparse.identity(dim)), format='csr')
+        return out
+
+    H = sum(embed({i: sparse.diags(energies)}) for i, (energies, _) in enumerate(modes))
+    for (i, j), g in couplings.items():
+        H = H + g*embed({i: sparse.csr_matrix(modes[i][1]), j: sparse.csr_matrix(modes[j][1])})
+    return H.tocsc(), dims
+
+
+def dressed(H, dims, states, guesses=None):
+    # {state: (energy, vector)} for each bare state (a tuple of occupations): the eigenvector near its bare energy
+    # with the largest overlap; guesses from a previous solve (e.g. the last coupled_spacing) warm start eigsh
+    guesses = guesses or {}
+    diagonal = H.diagonal()
+    result = {}
+    for state in states:
+        index = np.ravel_multi_index(state, dims)
+        energy, v0 = guesses.get(state, (diagonal[index], None))
+        k = min(eigenvalues, H.shape[0] - 2)
+        while True:
+            # a shift on an eigenvalue would make H - sigma singular
+            values, vectors = linalg.eigsh(H, k=k, sigma=energy + 1e-7, v0=v0)
+            # degenerate states (identical qudits) mix, each takes the best vector not already taken by another
+            for best in np.argsort(-np.abs(vectors[index])):
+                if all(abs(vector @ vectors[:, best]) < 0.5 for _, vector in result.values()):
+                    break
+            else:
+                # every vector found is taken, solve for more around the same energy
+                if k == H.shape[0] - 2:
+                    raise RuntimeError(f'no eigenvector left for state {state}, all of them overlap other states')
+                k = min(2*k, H.shape[0] - 2)
+                continue
+            break
+        result[state] = (values[best], vectors[:, best])
+    return result
+
+
+def coupling_capacitance(coupled_spacing, module='qudit_coupled', **params):
+    # C_c in F between the first two qudits, extracted (capacitance.py) from the chip module draws at
+    # coupled_spacing with params (qubit() kwargs), about 1.5 s a spacing; 1.55 fF for the nominal qudit_coupled
+    # no closed form is used: facing arms as coplanar strips ignore the ground between the two gaps and give 4x that
+    layout = importlib.import_module(module)
+    capacitance = importlib.import_module('capacitance')
+    return float(capacitance.qudit_capacitances(layout.qubit(coupled_spacing=coupled_spacing, **params))['c_c'][0])
+
+
+def exchange_coupling(c_c, c_q1, c_q2, f1, f2):
+    # capacitive qudit-qudit coupling in Hz, g = C_c/(2 sqrt(C_1 C_2)) sqrt(f_1 f_2)
+    return c_c/(2*np.sqrt(c_q1*c_q2))*np.sqrt(f1*f2)
+
+
+def layout_system(
+        coupled_spacing = 10,
+        xmon_length = 450,
+        xmon_spacing = 20,
+        xmon_width = 48,
+        top_connector_depth = 90,
+        readout_tunnel_width = 5,
+        readout_connector_metal_spacing = 15,
+        resoantor_length = 300,
+        JJ_width = 0.230,
+        JJ_width2 = 0.230,
+        n_qudits = 2,
+        c_c = None,
+):
+    # modes and couplings of a qudit_coupled chain: qudit i couples to qudit i+1 and to readout i
+    # the connector of every further qudit is deeper by the tunnel and metal spacing, as in qudit_coupled.qubit
+    # c_c: coupling capacitance in F, by default extracted from the drawn chip (coupling_capacitance)
+    # JJ_width and JJ_width2 may be given per qudit, the layout draws the same pair for all of them, so
+    # nominal qudits are resonant and their single excitations hybridize (ZZ is only meaningful once detuned)
+    if c_c is None:
+        c_c = coupling_capacitance(
+            coupled_spacing, xmon_length=xmon_length, xmon_width=xmon_width, xmon_spacing=xmon_spacing,
+            top_connector_depth=top_connector_depth, readout_tunnel_width=readout_tunnel_width,
+            readout_connector_metal_spacing=readout_connector_metal_spacing,
+        )
+    E_j = circuit.calculate_Ej_from_width(np.broadcast_to(JJ_width, n_qudits)) + circuit.calculate_Ej_from_width(np.broadcast_to(JJ_width2, n_qudits))
+    params = dict(inverse_design.base_params, readout_tunnel_width=readout_tunnel_width, readout_connector_metal_spacing=readout_connector_metal_spacing)
+    qudits, resonators, couplings = [], [], {}
+    for i in range(n_qudits):
+        depth = top_connector_depth + i*(readout_tunnel_width + readout_connector_metal_spacing)
+        c_q, c_g = inverse_design.capacitances(xmon_length, depth)
+        E_c = circuit.charging_energy(c_q)
+        resonator_f = meander_frequency(
+            inverse_design.epsilon_eff, resoantor_length, inverse_design.resonator_radius, inverse_design.number_of_cycle,
+            inverse_design.connector_length(depth, params),
+        )
+        r_L, c_r = circuit.calculate_cr(resonator_f)
+        qudits.append(dict(mode=qudit_mode(E_j[i], E_c), c_q=c_q, f=circuit.calculate_qubit_f(E_j[i], E_c)))
+        resonators.append(resonator_mode(resonator_f))
+        couplings[(i, n_qudits + i)] = circuit.coupling_strength(c_g, c_q, c_r, resonator_f)/1e9
+    for i in range(n_qudits - 1):
+        a, b = qudits[i], qudits[i + 1]
+        couplings[(i, i + 1)] = exchange_coupling(c_c, a['c_q'], b['c_q'], a['f'], b['f'])/1e9
+    return [qudit['mode'] for qudit in qudits] + resonators, couplings
+
+
+def analyze(modes, couplings, guesses=None):
+    # dressed qudit and readout frequencies, static ZZ of neighbouring qudits and the dispersive shift
+    # (half the readout frequency change from |0> to |1> of its qudit), in Hz
+    # the dressed states are returned as well, to warm start the next solve
+    H, dims = hamiltonian(modes, couplings)
+    n_qudits = len(modes)//2
+
+    def state(*excited):
+        occupation = [0]*len(modes)
+        for i in excited:
+            occupation[i] += 1
+        return tuple(occupation)
+
+    states = {state()}
+    for i in range(n_qudits):
+        states |= {state(i), state(n_qudits + i), state(i, n_qudits + i)}
+    for i in range(n_qudits - 1):
+        states.add(state(i, i + 1))
+    solved = dressed(H, dims, sorted(states), guesses)
+    E = {key: value[0] for key, value in solved.items()}
+    E0 = E[state()]
+    result = dict(qudit_f=[], readout_f=[], chi=[], zz=[])
+    for i in range(n_qudits):
+        r = n_qudits + i
+        result['qudit_f'].append(E[state(i)] - E0)
+        result['readout_f'].append(E[state(r)] - E0)
+        result['chi'].append(((E[state(i, r)] - E[state(i)]) - (E[state(r)] - E0))/2)
+    for i in range(n_qudits - 1):
+        result['zz'].append(E[state(i, i + 1)] - E[state(i)] - E[state(i + 1)] + E0)
+    result = {name: np.array(values)*1e9 for name, values in result.items()}
+    return result, solved
+
+
+def sweep_spacing(spacings, **params):
+    # analyze() over coupled_spacing, each solve warm started from the dressed states of the previous spacing
+    # returns {name: array (len(spacings), ...)} with the coupling capacitance and qudit-qudit g added
+    rows, guesses = [], None
+    for spacing in spacings:
+        c_c = params.get('c_c')
+        if c_c is None:
+            c_c = coupling_capacitance(spacing, **{name: params[name] for name in drawn_params if name in params})
+        modes, couplings = layout_system(coupled_spacing=spacing, **dict(params, c_c=c_c))
+        result, guesses = analyze(modes, couplings, guesses)
+        n_qudits = len(modes)//2
+        result['g'] = np.array([couplings[(i, i + 1)] for i in range(n_qudits - 1)])*1e9
+        result['c_c'] = c_c
+        rows.append(result)
+    return {name: np.array([row[name] for row in rows]) for name in rows[0]}
+
+
+if __name__ == '__main__':
+    # the nominal qudit_coupled chip over coupled_spacing: the qudits are the same at every spacing, so after the
+    # first one their levels come from the transmon cache; C_c is extracted from the chip drawn at every spacing
+    spacings = np.linspace(5, 30, 11)
+    result = sweep_spacing(spacings)
+    for spacing, c_c, g, qudit_f in zip(spacings, result['c_c'], result['g'][:, 0], result['qudit_f']):
+        print(f"# coupled_spacing {spacing:.1f} um: c_c {c_c*1e15:.3f} fF, g {g/1e6:.2f} MHz, qudit_f {', '.join(f'{f/1e9:.4f}' for f in qudit_f)} GHz")
+    print(f"# transmon cache: {transmon.stats['hits']} hits, {transmon.stats['misses']} misses, hit rate {transmon.hit_rate():.0%}")
+    assert transmon.hit_rate() > 0.9, transmon.stats
+    # a batch of designs larger than the cache is solved in one go
+    E_c = circuit.charging_energy(80e-15)
+    f = transmon.transitions(np.linspace(20, 80, 10**5)*E_c, E_c)
+    print(f'# {len(f)} designs, f_01 {f[0, 0]/1e9:.3f} to {f[-1, 0]/1e9:.3f} GHz, {len(transmon.cache)} of them cached')
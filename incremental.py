@@ -0,0 +1,64 @@
+import inspect
+import time
+
+# a layout as a graph of stages, for interactive editing: Design.update(**changes) re-executes only the stages
+# whose arguments changed (a changed parameter, or a changed result of an earlier stage they use),
+# every other stage keeps its last result
+# a stage reads the design parameters named like its function parameters, plus inputs taken from earlier stages
+
+
+class Stage:
+    def __init__(self, name, func, **inputs):
+        # inputs: parameter -> name of an earlier stage (its result) or a function of the results so far
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.reads = tuple(name for name in inspect.signature(func).parameters if name not in inputs)
+
+    def arguments(self, params, results):
+        args = {name: params[name] for name in self.reads if name in params}
+        for name, source in self.inputs.items():
+            args[name] = results[source] if isinstance(source, str) else source(results)
+        return args
+
+
+def unchanged(old, new):
+    # components compare by identity, plain values by value
+    if old is None or old.keys() != new.keys():
+        return False
+    return all(old[name] is new[name] or (not hasattr(new[name], 'kcl') and old[name] == new[name]) for name in new)
+
+
+class Design:
+    def __init__(self, stages, **params):
+        self.stages = stages
+        self.params = params
+        self.results = {}
+        self.arguments = {}
+        self.rebuilt = []
+        self.times = {}
+
+    def readers(self, parameter):
+        # stages that read a design parameter directly
+        return [stage.name for stage in self.stages if parameter in stage.reads]
+
+    def build(self):
+        # the last stage is the output and always runs: callers such as write() modify what it returns
+        self.rebuilt = []
+        for stage in self.stages:
+            args = stage.arguments(self.params, self.results)
+            if stage is not self.stages[-1] and unchanged(self.arguments.get(stage.name), args):
+                continue
+            start = time.perf_counter()
+            self.results[stage.name] = stage.func(**args)
+            self.times[stage.name] = time.perf_counter() - start
+            self.arguments[stage.name] = args
+            self.rebuilt.append(stage.name)
+        return self.results[self.stages[-1].name]
+
+    def update(self, **params):
+        unknown = [name for name in params if name not in self.params and not self.readers(name)]
+        if unknown:
+            raise TypeError(f'no stage reads {unknown}')
+        self.params.update(params)
+        return self.build()
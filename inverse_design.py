@@ -0,0 +1,187 @@
+import importlib
+import inspect
+
+import numpy as np
+
+import circuit
+import readout
+from resonator_model import meander_frequency, solve_meander
+
+# target specs -> qubit() kwargs, searched with the circuit formulas and the resonator length model
+# only the returned design needs a gdsfactory build
+epsilon_r = 11.45
+epsilon_eff = (epsilon_r + 1)/2
+
+# geometry the search leaves alone, as in driver.py
+base_params = dict(
+    xmon_width=40, xmon_spacing=15,
+    readout_connector_spacing=4, readout_tunnel_width=5, readout_connector_metal_spacing=10,
+    drive_port_spacing=15, flux_port_spacing=5,
+    overall_portWidth=10, route_radius=50,
+    tranmission_width=20, tranmission_tunnel_width=12, tranmission_resonator_offset=4,
+)
+bounds = dict(xmon_length=(250, 550), top_connector_depth=(60, 180))
+
+# JJ() asserts 0.1 <= FINGER_length <= 6, widths are drawn on a 10 nm grid
+finger_bounds = (0.1, 6)
+jj_step = 0.01
+# resonator() always draws 5 cycles with radius 30
+resonator_radius = 30
+number_of_cycle = 5
+length_bounds = (2*resonator_radius, 400)
+
+# reference point of the capacitance scaling: the driver.py geometry and the c_q, c_g physics.ipynb uses for it
+reference = dict(xmon_length=420, top_connector_depth=120, c_q=1.58e-13, c_g=5.421e-15)
+
+
+def capacitances(xmon_length, top_connector_depth):
+    # first order: c_q grows with the cross arms, c_g with the depth of the readout connector
+    c_q = reference['c_q']*xmon_length/reference['xmon_length']
+    c_g = reference['c_g']*top_connector_depth/reference['top_connector_depth']
+    return c_q, c_g
+
+
+def connector_length(top_connector_depth, params=base_params):
+    # the resonator path includes the outer depth of the connector, see top_connector_mod
+    return top_connector_depth + params['readout_tunnel_width'] + params['readout_connector_metal_spacing']
+
+
+def connector_clearance(xmon_length, top_connector_depth, params=base_params):
+    # ground left between the end of the readout claw (with its gap) and the gap of the side arms, um,
+    # from the placement in qudit_core; a claw deeper than the top arm runs into the side arms
+    return xmon_length/2 - params['xmon_width']/2 - params['readout_tunnel_width'] + params['readout_connector_spacing'] - top_connector_depth
+
+
+def junction_widths(E_j, ratio=0.5):
+    # split E_j over the two junctions of the SQUID and snap to the drawing grid
+    JJ_width = np.round(circuit.calculate_jj_width(E_j*ratio)/jj_step)*jj_step
+    JJ_width2 = np.round(circuit.calculate_jj_width(E_j*(1 - ratio))/jj_step)*jj_step
+    return JJ_width, JJ_width2
+
+
+def predict(xmon_length, top_connector_depth, JJ_width, JJ_width2, resoantor_length, q_ext=circuit.q_ext, params=base_params, extracted=None):
+    # what a drawn design does, in Hz: qubit_f, anharmonicity (E_c/h), chi, kappa, resonator_f,
+    # and the readout discrimination of readout.py probing at the resonator frequency
+    # extracted: (c_q, c_g) of the built layout (capacitance.py) in place of the reference scaling
+    c_q, c_g = capacitances(xmon_length, top_connector_depth) if extracted is None else extracted
+    resonator_f = meander_frequency(
+        epsilon_eff, resoantor_length, resonator_radius, number_of_cycle,
+        connector_length(top_connector_depth, params), max_sagitta=params.get('max_sagitta'),
+    )
+    E_c = circuit.charging_energy(c_q)
+    E_j = circuit.calculate_Ej_from_width(JJ_width) + circuit.calculate_Ej_from_width(JJ_width2)
+    qubit_f = circuit.calculate_qubit_f(E_j, E_c)
+    r_L, c_r = circuit.calculate_cr(resonator_f)
+    g = circuit.coupling_strength(c_g, c_q, c_r, resonator_f)
+    chi = circuit.dispersive_shift(g, resonator_f - qubit_f, E_c/circuit.h_bar)
+    kappa = resonator_f/q_ext
+    return dict(
+        qubit_f=qubit_f,
+        anharmonicity=E_c/circuit.h,
+        chi=chi,
+        kappa=kappa,
+        resonator_f=resonator_f,
+        c_q=c_q,
+        c_g=c_g,
+        **readout.discrimination(chi, kappa),
+    )
+
+
+def candidates(xmon_length, top_connector_depth, qubit_f, resonator_f, ratio=0.5, params=base_params):
+    # junction widths and resonator length that put each (xmon_length, top_connector_depth) on target
+    c_q, c_g = capacitances(xmon_length, top_connector_depth)
+    E_c = circuit.charging_energy(c_q)
+    JJ_width, JJ_width2 = junction_widths(circuit.calculate_Ej(E_c, qubit_f), ratio)
+    resoantor_length, cycles = solve_meander(
+        resonator_f, epsilon_eff, resonator_radius,
+        connector_length(top_connector_depth, params), number_of_cycle=number_of_cycle,
+        max_sagitta=params.get('max_sagitta'),
+    )
+    return dict(
+        xmon_length=xmon_length,
+        top_connector_depth=top_connector_depth,
+        JJ_width=JJ_width,
+        JJ_width2=JJ_width2,
+        resoantor_length=np.round(resoantor_length, 3),
+    )
+
+
+def feasible(design, params=base_params):
+    ok = np.ones(np.shape(design['xmon_length']), dtype=bool)
+    # the claw keeps as much ground to the side arms as to the xmon
+    ok &= connector_clearance(design['xmon_length'], design['top_connector_depth'], params) >= params['readout_connector_spacing']
+    for name in ('JJ_width', 'JJ_width2'):
+        ok &= (design[name] >= finger_bounds[0]) & (design[name] <= finger_bounds[1])
+    # nan where no meander fits
+    ok &= (design['resoantor_length'] >= length_bounds[0]) & (design['resoantor_length'] <= length_bounds[1])
+    return ok
+
+
+def cost(predicted, targets, weights=None):
+    # weighted sum of squared relative errors over the targets that are given
+    weights = weights or {}
+    total = 0
+    for name, target in targets.items():
+        if target is None:
+            continue
+        total = total + weights.get(name, 1)*((predicted[name] - target)/target)**2
+    return total
+
+
+def design_qubit(targets, weights=None, ratio=0.5, q_ext=circuit.q_ext, batch=4096, iterations=12, shrink=0.5, seed=0, params=base_params, bounds=bounds):
+    # targets: dict with any of qubit_f, anharmonicity, chi, kappa, resonator_f in Hz and the readout snr or overlap;
+    # qubit_f and resonator_f are required
+    # kappa only enters through q_ext, there is no geometry for it in this model, it is scored but not searched
+    # returns (qubit() kwargs, predicted parameters of that design)
+    rng = np.random.default_rng(seed)
+    low = np.array([bounds['xmon_length'][0], bounds['top_connector_depth'][0]], dtype=float)
+    high = np.array([bounds['xmon_length'][1], bounds['top_connector_depth'][1]], dtype=float)
+    span = high - low
+    best, best_cost = None, np.inf
+    for i in range(iterations):
+        points = rng.uniform(low, high, size=(batch, 2))
+        if best is not None:
+            points[0] = best
+        design = candidates(points[:, 0], points[:, 1], targets['qubit_f'], targets['resonator_f'], ratio, params)
+        predicted = predict(**design, q_ext=q_ext, params=params)
+        costs = np.where(feasible(design, params), cost(predicted, targets, weights), np.inf)
+        index = np.argmin(costs)
+        if costs[index] < best_cost:
+            best, best_cost = points[index], costs[index]
+        if best is None:
+            continue
+        # zoom in on the best design, staying inside the bounds
+        span = span*shrink
+        low = np.maximum(best - span/2, [bounds['xmon_length'][0], bounds['top_connector_depth'][0]])
+        high = np.minimum(best + span/2, [bounds['xmon_length'][1], bounds['top_connector_depth'][1]])
+
+    if best is None:
+        raise ValueError(f'no design within {bounds} meets the JJ and resonator constraints')
+
+    xmon_length, top_connector_depth = np.round(best, 1)
+    design = candidates(xmon_length, top_connector_depth, targets['qubit_f'], targets['resonator_f'], ratio, params)
+    kwargs = dict(params, **{name: float(value) for name, value in design.items()})
+    check_kwargs(kwargs)
+    predicted = {name: float(value) for name, value in predict(**design, q_ext=q_ext, params=params).items()}
+    return kwargs, predicted
+
+
+def check_kwargs(kwargs, module='qudit'):
+    # the same checks qubit() would hit, without building it
+    for name in ('JJ_width', 'JJ_width2'):
+        if not finger_bounds[0] <= kwargs[name] <= finger_bounds[1]:
+            raise ValueError(f'{name}={kwargs[name]} is outside {finger_bounds}')
+    if not length_bounds[0] <= kwargs['resoantor_length'] <= length_bounds[1]:
+        raise ValueError(f"resoantor_length={kwargs['resoantor_length']} is outside {length_bounds}")
+    if module is not None:
+        layout = importlib.import_module(module)
+        inspect.signature(layout.qubit).bind(**kwargs)
+    return kwargs
+
+
+if __name__ == '__main__':
+    kwargs, predicted = design_qubit(dict(qubit_f=5.4e9, anharmonicity=120e6, chi=-1.5e6, resonator_f=6.639e9))
+    for name, value in kwargs.items():
+        print(f'{name} = {value}')
+    for name, value in predicted.items():
+        print(f'# {name}: {value:.4g}')
@@ -0,0 +1,201 @@
+import atexit
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# named spans around the build phases, off unless QUDIT_PROFILE=1 or enable() is called
+# each span records wall time, peak RSS and the polygon/vertex count of the component it produced
+# with QUDIT_PROFILE=1 the report is printed and written to build/profile when the process exits
+enabled = os.environ.get('QUDIT_PROFILE', '0') != '0'
+profile_dir = Path(__file__).parent / 'build' / 'profile'
+records = []
+_stack = threading.local()
+_origin = time.perf_counter()
+
+
+def enable(flag=True):
+    global enabled
+    enabled = flag
+
+
+def reset():
+    global _origin
+    records.clear()
+    _origin = time.perf_counter()
+
+
+def peak_rss():
+    # MB, ru_maxrss is in KB on Linux and in bytes on macOS
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def geometry_counts(component):
+    # polygons and vertices over all layers of the component, references included
+    if not hasattr(component, 'kcl'):
+        # a KLayout Region
+        return component.count(), sum(polygon.num_points() for polygon in component.each())
+    polygons = vertices = 0
+    for layer_index in component.kcl.layer_indexes():
+        it = component.begin_shapes_rec(layer_index)
+        while not it.at_end():
+            shape = it.shape()
+            if shape.is_polygon() or shape.is_box() or shape.is_path():
+                polygons += 1
+                vertices += shape.polygon.num_points()
+            it.next()
+    return polygons, vertices
+
+
+class Span:
+    def __init__(self, name):
+        self.name = name
+        self.component = None
+
+    def count(self, component):
+        # the component whose geometry is reported when the span closes
+        self.component = component
+        return component
+
+
+@contextlib.contextmanager
+def span(name, component=None):
+    s = Span(name)
+    s.component = component
+    if not enabled:
+        yield s
+        return
+    stack = getattr(_stack, 'names', None)
+    if stack is None:
+        stack = _stack.names = []
+    stack.append(name)
+    rss_before = peak_rss()
+    start = time.perf_counter()
+    try:
+        yield s
+    finally:
+        duration = time.perf_counter() - start
+        rss_after = peak_rss()
+        record = dict(
+            name=name,
+            stack=list(stack),
+            start=start - _origin,
+            duration=duration,
+            thread=threading.get_ident(),
+            peak_rss_mb=rss_after,
+            rss_growth_mb=None if rss_after is None else rss_after - rss_before,
+            polygons=None,
+            vertices=None,
+        )
+        if s.component is not None:
+            record['polygons'], record['vertices'] = geometry_counts(s.component)
+        records.append(record)
+        stack.pop()
+
+
+def profiled(func=None, name=None):
+    # span around every call, counting the returned component
+    if func is None:
+        return functools.partial(profiled, name=name)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not enabled:
+            return func(*args, **kwargs)
+        with span(name or func.__name__) as s:
+            result = func(*args, **kwargs)
+            if hasattr(result, 'begin_shapes_rec'):
+                s.count(result)
+            return result
+
+    return wrapper
+
+
+def report():
+    # total and self time per span name, slowest first
+    rows = {}
+    for record in records:
+        row = rows.setdefault(record['name'], dict(name=record['name'], calls=0, total=0, self=0, peak_rss_mb=0))
+        row['calls'] += 1
+        row['total'] += record['duration']
+        row['self'] += record['duration']
+        row['peak_rss_mb'] = max(row['peak_rss_mb'], record['peak_rss_mb'] or 0)
+    for record in records:
+        if len(record['stack']) > 1 and record['stack'][-2] in rows:
+            rows[record['stack'][-2]]['self'] -= record['duration']
+    return sorted(rows.values(), key=lambda row: row['total'], reverse=True)
+
+
+def print_report():
+    print(f"{'span':<28}{'calls':>6}{'total s':>10}{'self s':>10}{'peak MB':>10}")
+    for row in report():
+        print(f"{row['name']:<28}{row['calls']:>6}{row['total']:>10.3f}{row['self']:>10.3f}{row['peak_rss_mb']:>10.0f}")
+
+
+def write_json(path):
+    with open(path, 'w') as f:
+        json.dump(dict(spans=records, summary=report()), f, indent=2)
+
+
+def write_trace(path):
+    # Chrome trace event format, opens in chrome://tracing, Perfetto and speedscope
+    events = []
+    for record in records:
+        events.append(dict(
+            name=record['name'],
+            ph='X',
+            ts=record['start']*1e6,
+            dur=record['duration']*1e6,
+            pid=os.getpid(),
+            tid=record['thread'],
+            args={k: record[k] for k in ('peak_rss_mb', 'rss_growth_mb', 'polygons', 'vertices')},
+        ))
+    with open(path, 'w') as f:
+        json.dump(dict(traceEvents=events, displayTimeUnit='ms'), f)
+
+
+def write_folded(path):
+    # collapsed stacks for flamegraph.pl / inferno, self time in microseconds
+    self_time = {}
+    for record in records:
+        key = ';'.join(record['stack'])
+        self_time[key] = self_time.get(key, 0) + record['duration']
+        if len(record['stack']) > 1:
+            parent = ';'.join(record['stack'][:-1])
+            self_time[parent] = self_time.get(parent, 0) - record['duration']
+    with open(path, 'w') as f:
+        for key, seconds in self_time.items():
+            f.write(f'{key} {max(round(seconds*1e6), 0)}\n')
+
+
+def dump(prefix=None):
+    # prefix.json, prefix.trace.json and prefix.folded
+    if prefix is None:
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        script = Path(sys.argv[0]).stem if sys.argv[0] not in ('', '-c') else 'python'
+        prefix = profile_dir / f'{script}-{os.getpid()}'
+    write_json(f'{prefix}.json')
+    write_trace(f'{prefix}.trace.json')
+    write_folded(f'{prefix}.folded')
+    return prefix
+
+
+def _dump_at_exit():
+    if enabled and records:
+        print_report()
+        print(f'profile written to {dump()}.*')
+
+
+atexit.register(_dump_at_exit)
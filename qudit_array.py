@@ -0,0 +1,180 @@
+import inspect
+import math
+
+import gdsfactory as gf
+
+from cell_cache import cached_cell, param_hash
+from cpw import cpw_cross_section, cpw_route
+from pads import get_pad
+from profiler import profiled
+from qudit import jj_pair, qudit_core, resonator_event
+
+# arrays of qudits coupled through the facing arms of neighbouring xmons, the qudits of qudit_coupled.py and
+# qudit_coupled_august.py are placed by it as well
+# every distinct qudit is built once (cached_cell), the copies are references, so build time follows
+# the number of distinct designs rather than the number of qudits
+
+# one qudit, the driver.py design
+qudit_defaults = dict(
+    xmon_length=420, xmon_width=40, xmon_spacing=15,
+    readout_connector_spacing=4, readout_tunnel_width=5, readout_connector_metal_spacing=10,
+    drive_port_spacing=15, flux_port_spacing=5,
+    top_connector_depth=120, resoantor_length=285,
+    JJ_width=0.65, JJ_width2=0.12,
+)
+topologies = ('line', 'rows')
+
+
+@cached_cell
+@profiled
+def qudit_cell(
+        xmon_length = 420,
+        xmon_width = 40,
+        xmon_spacing = 15,
+        readout_connector_spacing = 4,
+        readout_tunnel_width = 5,
+        readout_connector_metal_spacing = 10,
+        drive_port_spacing = 15,
+        flux_port_spacing = 5,
+        top_connector_depth = 120,
+        resoantor_length = 285,
+        JJ_width = 0.65,
+        JJ_width2 = 0.12,
+):
+    # xmon, readout resonator and junctions, xmon centered on the origin
+    c = gf.Component()
+    core = qudit_core(
+        xmon_length=xmon_length, xmon_width=xmon_width, xmon_spacing=xmon_spacing,
+        readout_connector_spacing=readout_connector_spacing, readout_tunnel_width=readout_tunnel_width,
+        readout_connector_metal_spacing=readout_connector_metal_spacing,
+        drive_port_spacing=drive_port_spacing, flux_port_spacing=flux_port_spacing,
+        top_connector_depth=top_connector_depth, resoantor_length=resoantor_length,
+    )
+    c << core
+    c << jj_pair(JJ_width=JJ_width, JJ_width2=JJ_width2, xmon_spacing=xmon_spacing, xmon_length=xmon_length)
+    c.add_ports(core.ports)
+    c.info.update(dict(core.info))
+    return c
+
+
+def arm(spec):
+    # distance from the xmon center to the outer edge of its gap
+    return spec['xmon_length']/2 + spec['xmon_spacing']
+
+
+def layout_rows(n, topology='line', columns=None):
+    # indices of the qudits in each row and the coupled pairs (horizontal neighbours, rows are not coupled)
+    if topology not in topologies:
+        raise ValueError(f'topology {topology!r} is not one of {topologies}')
+    if topology == 'line':
+        columns = n
+    columns = columns or math.ceil(math.sqrt(n))
+    rows = [list(range(start, min(start + columns, n))) for start in range(0, n, columns)]
+    couplings = [(row[i], row[i + 1]) for row in rows for i in range(len(row) - 1)]
+    return rows, couplings
+
+
+def qudit_specs(qudits, defaults=qudit_defaults):
+    # an int means that many default qudits, otherwise one dict of qudit_cell kwargs per qudit
+    if isinstance(qudits, int):
+        qudits = [{}] * qudits
+    return [dict(defaults, **spec) for spec in qudits]
+
+
+def drive_port(i, row):
+    # the drive on the free side: the left arm of the first qudit of a row, the right arm of the last,
+    # the bottom arm of the ones whose left and right arms both face a neighbour
+    if i == row[0]:
+        return 'drive'
+    return 'drive2' if i == row[-1] else 'drive_bottom'
+
+
+@profiled
+def qudit_array(
+        qudits,
+        topology = 'line',
+        columns = None,
+        coupled_spacing = 10,
+        row_spacing = 300,
+        feedline_margin = 200,
+        tranmission_width = 20,
+        tranmission_tunnel_width = 12,
+        tranmission_resonator_offset = 4,
+        cell = None,
+        feedline = True,
+        launchers = False,
+        launcher = 'pad_transmission2.gds',
+        route_radius = 60,
+):
+    # topology 'line' is one coupled chain, 'rows' is rows of `columns` chains (default square) that are not
+    # coupled to each other, stacked downwards
+    # each row shares one readout feedline above its resonators, feedline=False leaves the readout to the caller
+    # launchers=True ends every feedline in a launcher pad on each side, the line routed between their fronts
+    # ports: readout_in_<row>/readout_out_<row> (the feedline ends, or the backs of the launchers), flux_<i> and
+    # drive_<i> (see drive_port) for every qudit
+    # cell: the qudit cell of another layout module (ports drive, drive2, drive_bottom and flux, resonator_ymax
+    # and the resonator fields of qudit.resonator_event in its info), its specs then fall back on its own defaults, default qudit_cell with qudit_defaults
+    cell = cell or qudit_cell
+    defaults = {name: parameter.default for name, parameter in inspect.signature(cell).parameters.items()}
+    specs = qudit_specs(qudits, dict(defaults, **qudit_defaults) if cell is qudit_cell else defaults)
+    rows, couplings = layout_rows(len(specs), topology, columns)
+    cells = [cell(**spec) for spec in specs]
+    pad = get_pad(launcher) if feedline and launchers else None
+
+    array = gf.Component()
+    resonator_ymax = []
+    y_row = 0
+    for r, row in enumerate(rows):
+        # x positions: neighbouring gaps are coupled_spacing apart
+        x = [0]
+        for a, b in zip(row[:-1], row[1:]):
+            x.append(x[-1] + arm(specs[a]) + coupled_spacing + arm(specs[b]))
+
+        row_ymax = max(cells[i].info['resonator_ymax'] for i in row)
+        feedline_y = row_ymax + tranmission_width/2 + tranmission_tunnel_width + tranmission_resonator_offset
+        top = feedline_y + tranmission_width/2 + tranmission_tunnel_width if feedline else row_ymax
+        bottom = min(cells[i].dymin for i in row)
+        if pad is not None:
+            top = max(top, feedline_y + pad.dysize/2)
+            bottom = min(bottom, feedline_y - pad.dysize/2)
+        # rows stack downwards, the feedline of this row sits row_spacing below the previous row
+        if r > 0:
+            y_row -= top + row_spacing
+        for i, dx in zip(row, x):
+            ref = array << cells[i]
+            ref.dmove((dx, y_row))
+            ref.name = f'qudit_{i}'
+            array.add_port(f'flux_{i}', port=ref.ports['flux'])
+            array.add_port(f'drive_{i}', port=ref.ports[drive_port(i, row)])
+            resonator_event(cells[i], cell.__module__)
+        resonator_ymax.append(y_row + row_ymax)
+        if not feedline:
+            y_row += bottom
+            continue
+
+        x_start = x[0] - arm(specs[row[0]]) - feedline_margin
+        x_end = x[-1] + arm(specs[row[-1]]) + feedline_margin
+        if pad is None:
+            xs = cpw_cross_section(tranmission_width, tranmission_tunnel_width)
+            line = gf.path.extrude(gf.path.straight(length=x_end - x_start), cross_section=xs)
+            feedline_ref = array << line
+            feedline_ref.dmove((x_start, y_row + feedline_y))
+            ends = feedline_ref.ports['o1'], feedline_ref.ports['o2']
+        else:
+            # the launchers face each other across the row, the fronts where the stub ends would be
+            refs = []
+            for x_front, angle in ((x_start, 0), (x_end, 180)):
+                pad_ref = array << pad
+                pad_ref.drotate(angle)
+                pad_ref.dmove((x_front - pad_ref.ports['front'].dx, y_row + feedline_y - pad_ref.ports['front'].dy))
+                refs.append(pad_ref)
+            array << cpw_route(refs[0].ports['front'], refs[1].ports['front'], tranmission_width, tranmission_tunnel_width, route_radius)
+            ends = refs[0].ports['back'], refs[1].ports['back']
+        array.add_port(f'readout_in_{r}', port=ends[0])
+        array.add_port(f'readout_out_{r}', port=ends[1])
+        y_row += bottom
+
+    array.info['couplings'] = couplings
+    array.info['resonator_ymax'] = resonator_ymax
+    array.info['distinct_cells'] = len({param_hash(cell.__name__, spec) for spec in specs})
+    return array
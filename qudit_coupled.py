@@ -1,15 +1,24 @@
 import gdsfactory as gf
 import matplotlib.pyplot as plt
 import numpy as np
+import time
 from gdsfactory.generic_tech import LAYER
 from gdsfactory.generic_tech import get_generic_pdk
 from gdsfactory.cross_section import ComponentAlongPath
+from cell_cache import cached_cell, memo_cell
+from cpw import cpw_route
+from resonator_model import arc_npoints, edge_offset
+from profiler import profiled, span
+from pads import get_pad, library_stamp
+from air_bridges import air_bridge
+from qudit_array import qudit_array
 import warnings
 ignore = True
 if ignore:
     warnings.filterwarnings("ignore")
 
 
+@memo_cell(basename='xmon_coupled')
 def xmon(xmon_length , xmon_width, xmon_spacing, drive_spacing, flux_spacing):
     unit_convert = 1000
     xmon = gf.Component()
@@ -37,6 +46,13 @@ def xmon(xmon_length , xmon_width, xmon_spacing, drive_spacing, flux_spacing):
                         orientation = 180,
                         layer = (5,0)
                         )
+    # for a qudit whose left and right arms both face a neighbour (qudit_array), beside its bottom arm
+    xmon.add_port(name = 'drive_bottom',
+                        center = [(xmon.dxmin + xmon.dxmax)/2 + xmon_width/2 + xmon_spacing + drive_spacing, (xmon.dymin + xmon.dymax)/2 - xmon_length/4],
+                        width = 11,
+                        orientation = 180,
+                        layer = (5,0)
+                        )
 
 
     return xmon
@@ -83,42 +99,45 @@ def calculate_resonator_frequency(epsilon_eff, length):
     c = 299792458
     return c/(np.sqrt(epsilon_eff) * 4 * length)
 
-def one_cycle(length, radius):
+def one_cycle(length, radius, max_sagitta=None):
+    half_turn = arc_npoints(radius, 180, max_sagitta, edge_offset, npoints=1000)
     P = gf.Path()
     P += gf.path.straight(length=length)
-    P += gf.path.arc(radius=radius, angle = 180, npoints=1000)  # Circular arc
+    P += gf.path.arc(radius=radius, angle = 180, npoints=half_turn)  # Circular arc
     P += gf.path.straight(length=length)  # Straight section
-    P += gf.path.arc(radius=radius, angle = -180, npoints=1000)  # Circular arc
+    P += gf.path.arc(radius=radius, angle = -180, npoints=half_turn)  # Circular arc
     return P.length() 
 
-def create_resonator(length, radius, number_of_cycle):
+def create_resonator(length, radius, number_of_cycle, max_sagitta=None):
+    # max_sagitta: arcs with the fewest points keeping the outer gap edge within it (database units of write()),
+    # None keeps 100 points per arc
+    quarter_turn = arc_npoints(radius, 90, max_sagitta, edge_offset)
+    half_turn = arc_npoints(radius, 180, max_sagitta, edge_offset)
     P = gf.Path()
 
     for i in range(int(number_of_cycle)):
         if i == 0:
             P += gf.path.straight(length=length)
-            P += gf.path.arc(radius=radius, angle = 90, npoints=100)  # Circular arc
+            P += gf.path.arc(radius=radius, angle = 90, npoints=quarter_turn)  # Circular arc
             P += gf.path.straight(length=100)
-            P += gf.path.arc(radius=radius, angle=90, npoints=100)
+            P += gf.path.arc(radius=radius, angle=90, npoints=quarter_turn)
 
         else:
             P += gf.path.straight(length=length)
-            P += gf.path.arc(radius=radius, angle = 180, npoints=100)  # Circular arc
+            P += gf.path.arc(radius=radius, angle = 180, npoints=half_turn)  # Circular arc
         P += gf.path.straight(length=length)  # Straight section
-        P += gf.path.arc(radius=radius, angle = -180, npoints=100)  # Circular arc
+        P += gf.path.arc(radius=radius, angle = -180, npoints=half_turn)  # Circular arc
     
     P += gf.path.straight(length=length//2-radius)
-    P += gf.path.arc(radius=radius, angle = 90, npoints=100)
+    P += gf.path.arc(radius=radius, angle = 90, npoints=quarter_turn)
     P += gf.path.straight(length = 180)
     return P.dmirror((1,0))
 
-def resonator(epsilon_eff, frequency = 6.7e9, length = 300, radius = 30, air_bridge_flag = True, top_connector_depth = 80):
+@profiled
+def resonator(epsilon_eff, frequency = 6.7e9, length = 300, radius = 30, air_bridge_flag = True, top_connector_depth = 80, max_sagitta = None):
     resonator_length_theory = calculate_resonator_length(epsilon_eff, frequency)*1e6
     number_of_cycle = 5
-    Path = create_resonator(length, radius, number_of_cycle)
-    Path_length = Path.length() + top_connector_depth
-    print(f'Path length: {Path_length} um')
-    print('resonator_frequency: ', f'{np.round(calculate_resonator_frequency(epsilon_eff, Path_length*1e-6)/1e9,3)} GHz' )
+    Path = create_resonator(length, radius, number_of_cycle, max_sagitta)
 
     resonator_width = 10
     tunnel_width = 6
@@ -136,9 +155,18 @@ def resonator(epsilon_eff, frequency = 6.7e9, length = 300, radius = 30, air_bri
     else:
         x = gf.CrossSection(sections=[s1, s2], components_along_path=[via])
 
+    start = time.perf_counter()
     c = gf.path.extrude(Path, cross_section=x)
+    # for the telemetry event (qudit.resonator_event), carried up into the cached cells that place the resonator;
+    # the extrude time is the one of the build that drew the cell
+    c.info.update(dict(
+        resonator_length=length, resonator_radius=radius, resonator_cycles=number_of_cycle,
+        resonator_connector_depth=top_connector_depth, resonator_max_sagitta=max_sagitta,
+        resonator_extrude_time=time.perf_counter() - start,
+    ))
     return c 
 
+@memo_cell
 def JJ(FINGER_length, total_length):
     jj_width = 3
     assert (FINGER_length >= 0.1 and FINGER_length <= 6)
@@ -174,6 +202,9 @@ def JJ(FINGER_length, total_length):
 
     taper_cover_ref = canvas_jj << taper_cover
     taper_cover_ref.connect("o1", left_rectangle_ref.ports['o3'], allow_layer_mismatch=True)
+    # the cover starts 0.1 um back over the lead at its full width, the bare taper would end in two 20 degree points
+    cover_lead_ref = canvas_jj << gf.components.rectangle(size=(0.1, jj_width), port_type='optical', layer=(60,0))
+    cover_lead_ref.dmove((left_rectangle_ref.dxmax - 0.1, left_rectangle_ref.dymin))
     finger_cover_ref = canvas_jj << gf.components.rectangle(size=(1.36+0.14, FINGER_length), port_type='optical', layer = (60,0))
     finger_cover_ref.connect("o1", taper_cover_ref.ports['o2'], allow_layer_mismatch = True)
     
@@ -183,108 +214,21 @@ def JJ(FINGER_length, total_length):
     return canvas_jj
 
 
-@gf.cell
-def air_bridge(xvr_length):
-
-    if xvr_length >=5 and xvr_length <=16:
-        xvr_width = 5
-    elif xvr_length > 16 and xvr_length <= 27:
-        xvr_width = 7.5
-    elif xvr_length > 27 and xvr_length <= 32:
-        xvr_width = 10
-    else:
-        raise Exception('xvr length is greater than 32')
-
-
-    if xvr_length >=5 and xvr_length <=16:
-        RR_length = 8
-    elif xvr_length > 16 and xvr_length <= 27:
-        RR_length = 10
-    elif xvr_length > 27 and xvr_length <= 32:
-        RR_length = 14 
-
-    
-    RR_width = xvr_width + 3
-    Tether_width = RR_width + 2*1.5
-    Tether_length = RR_length+2*1.5
-    Tether_offset = (Tether_width - xvr_width)/2
-    # p_left = gf.kdb.DPolygon([(0,0), (Tether_width, 0), (Tether_width, Tether_width), (0, Tether_width)])
-    # p_right = gf.kdb.DPolygon([(Tether_width+xvr_length, 0), (Tether_width*2+xvr_length, 0), (Tether_width*2+xvr_length, Tether_width), (Tether_width+xvr_length, Tether_width)])  
-    # p_middle = gf.kdb.DPolygon([(Tether_width, Tether_offset), (Tether_width+xvr_length, Tether_offset), (Tether_width+xvr_length, Tether_width-Tether_offset), (Tether_width, Tether_width-Tether_offset)])
-    # r1 = gf.kdb.Region(p_left.to_itype(gf.kcl.dbu))  # convert from um to DBU
-    # r2 = gf.kdb.Region(p_right.to_itype(gf.kcl.dbu))  # convert from um to DBU
-    # r3 = r1.sized(-1500)
-    # r4 = r2.sized(-1500)
-
-    r3 = gf.kdb.DPolygon([(1.5, 1.5), (RR_length+1.5, 1.5), (RR_length+1.5, RR_width+1.5), (1.5, RR_width+1.5)])
-    r4 = gf.kdb.DPolygon([(Tether_length+xvr_length+1.5, 1.5), (Tether_length+xvr_length+1.5+RR_length, 1.5), 
-                          (Tether_length+xvr_length+1.5+RR_length, Tether_width-1.5), (Tether_length+xvr_length+1.5, Tether_width-1.5)])
-    p_middle = gf.kdb.DPolygon([(Tether_length, Tether_offset), (Tether_length+xvr_length, Tether_offset), (Tether_length+xvr_length, Tether_width-Tether_offset), (Tether_length, Tether_width-Tether_offset)])
-    p_left = r3.sized(1.5)
-    p_right = r4.sized(1.5)
-
-
-    left_canvas = gf.Component()
-    right_canvas = gf.Component()
-    mid_canvas = gf.Component()
-    left_canvas.add_polygon(p_left, layer=(31, 0))
-    right_canvas.add_polygon(p_right, layer=(31, 0))
-    mid_canvas.add_polygon(p_middle, layer=(31, 0))
-
-    c = gf.Component()
-    left_ref = c << left_canvas
-    right_ref = c << right_canvas
-    mid_ref = c << mid_canvas
-
-    c.add_polygon(r3, layer=(30, 0))
-    c.add_polygon(r4, layer=(30, 0))
-    c.flatten()
-
-    rotated = gf.Component()
-    qudit_ref = rotated << c
-    qudit_ref.drotate(90)
-    rotated.flatten()
-
-    d = gf.Component()
-    air_bridge_ref = d << rotated
-    air_bridge_ref.dmovex(0-air_bridge_ref.dx)
-    air_bridge_ref.dmovey(0-air_bridge_ref.dy)
-    d.flatten()
-
-    return d
-
-def qubit(
+@cached_cell
+@profiled
+def qudit_core(
         xmon_length = 450,
-        xmon_width = 48, 
+        xmon_width = 48,
         xmon_spacing = 20,
         readout_connector_spacing = 4,
         readout_tunnel_width = 5,
         readout_connector_metal_spacing = 15,
         drive_port_spacing = 4,
         flux_port_spacing = 3,
-        overall_portWidth = 10,
-        route_radius = 60,
-        tranmission_width = 20,
-        tranmission_tunnel_width = 12,
-        tranmission_resonator_offset = 4,
-
-        tranmission_width_drive = 10 ,
-        tranmission_tunnel_width_drive = 6,
-        tranmission_width_flux = 10 ,
-        tranmission_tunnel_width_flux = 5,
-        JJ_width = 0.230,
-        JJ_width2 = 0.230,
-        extrusion  = 4,
-
-        coupled_spacing = 10,
-
         top_connector_depth = 90,
+        max_sagitta = None,
 ):
-    unit_convert = 1e3
-
-    qubit_spacing = coupled_spacing + xmon_length + 2*xmon_spacing
-
-    # main canvas that holds everything
+    # xmon, top connector and readout resonator, with the xmon centered on the origin
     canvas_qubit = gf.Component()
 
     # creating top connector. This will be added to temporary canvas
@@ -304,76 +248,57 @@ def qubit(
     dy = xmon_ref.dymax  - top_ref.dymax
     top_ref.dmove([dx, dy + readout_tunnel_width * 2 + readout_connector_metal_spacing + readout_connector_spacing])
 
-    my_resonator = resonator(epsilon_eff, top_connector_depth=top_connector_depth)
+    my_resonator = resonator(epsilon_eff, top_connector_depth=top_connector_depth, max_sagitta=max_sagitta)
     resonator_ref = canvas_qubit << my_resonator
     resonator_ref.dmove((get_center(top_ref) - get_center(resonator_ref)))
     resonator_ref.dmove([0, top_ref.dymax - resonator_ref.dymin-5])
     resonator_ymax = resonator_ref.dymax
 
     
-    subtraction = gf.boolean(top_ref, resonator_ref, operation='and', layer=(5,0))
-    merged = gf.boolean(top_ref, resonator_ref, operation='or', layer=(5,0))
-    abc = gf.boolean(merged, subtraction, '-', layer=(5,0))
-    abc_1 = gf.boolean(merged, abc, '-', layer=(5,0))
-    temp = gf.Component()
-    rec = gf.components.rectangle(size = (10, 5), centered=True, layer=(5,0))
-    rec_ref = temp << rec
-    rec_ref.dmove(
-        ( - (rec_ref.dxmin + rec_ref.dxmax)/2 + (abc_1.dxmin + abc_1.dxmax)/2, 
-                    - (rec_ref.dymin + rec_ref.dxmax)/2 + (abc_1.dymin + abc_1.dymax)/2 + 1.25)
-                )
-    remain = gf.boolean(top_ref, rec_ref, '-', layer=(5,0))
-    remain_ref = canvas_qubit << remain
-
-
-
-
-
-    # creating top connector. This will be added to temporary canvas
-    # after creating resonator and deleting the middle piece, the gf.boolean Component will be added to main canvas
-    # this serve to hold only the positional information relative to the xmon placement
-    d = gf.Component() # temporary canvas for storing intermediate Component
-    top_connector2, top_connector_depth = top_connector_mod(connector_length=2*xmon_spacing+xmon_width+2*readout_connector_spacing, connector_depth=top_connector_depth, metal_spacing=readout_connector_metal_spacing, size = readout_tunnel_width)
-    top_ref2 = d << top_connector2
-
-    # creating xmon
-    drive_spacing = drive_port_spacing
-    flux_spacing = flux_port_spacing 
-    xmon_ref2 = canvas_qubit << xmon(xmon_length=xmon_length, xmon_width=xmon_width, xmon_spacing=xmon_spacing, drive_spacing=drive_spacing, flux_spacing=flux_spacing)
-
-    # moving top connector to correct position
-    dx = (xmon_ref2.dxmax + xmon_ref2.dxmin)/2 - (top_ref2.dxmax + top_ref2.dxmin)/2
-    dy = xmon_ref2.dymax  - top_ref2.dymax
-    top_ref2.dmove([dx, dy + readout_tunnel_width * 2 + readout_connector_metal_spacing + readout_connector_spacing])
-    xmon_ref2.dmove((qubit_spacing, 0))
-    top_ref2.dmove((qubit_spacing,0))
-
-    my_resonator2 = resonator(epsilon_eff, top_connector_depth=top_connector_depth)
-    resonator_ref2 = canvas_qubit << my_resonator2
-    resonator_ref2.dmove((get_center(top_ref2) - get_center(resonator_ref2)))
-    resonator_ref2.dmove([0, top_ref2.dymax - resonator_ref2.dymin-5])
-    resonator_ymax = resonator_ref2.dymax
-
-    
-    subtraction2 = gf.boolean(top_ref2, resonator_ref2, operation='and', layer=(5,0))
-    merged2 = gf.boolean(top_ref2, resonator_ref2, operation='or', layer=(5,0))
-    abc2 = gf.boolean(merged2, subtraction2, '-', layer=(5,0))
-    abc_1_2 = gf.boolean(merged2, abc2, '-', layer=(5,0))
-    temp2 = gf.Component()
-    rec2 = gf.components.rectangle(size = (10, 5), centered=True, layer=(5,0))
-    rec_ref2 = temp2 << rec2
-    rec_ref2.dmove(
-        ( - (rec_ref2.dxmin + rec_ref2.dxmax)/2 + (abc_1_2.dxmin + abc_1_2.dxmax)/2, 
-                    - (rec_ref2.dymin + rec_ref2.dxmax)/2 + (abc_1_2.dymin + abc_1_2.dymax)/2 + 1.25)
-                )
-    remain2 = gf.boolean(top_ref2, rec_ref2, '-', layer=(5,0))
-    remain_ref2 = canvas_qubit << remain2
-
-
+    with span('connector_boolean'):
+        subtraction = gf.boolean(top_ref, resonator_ref, operation='and', layer=(5,0))
+        merged = gf.boolean(top_ref, resonator_ref, operation='or', layer=(5,0))
+        abc = gf.boolean(merged, subtraction, '-', layer=(5,0))
+        abc_1 = gf.boolean(merged, abc, '-', layer=(5,0))
+        temp = gf.Component()
+        rec = gf.components.rectangle(size = (10, 5), centered=True, layer=(5,0))
+        rec_ref = temp << rec
+        rec_ref.dmove(
+            ( - (rec_ref.dxmin + rec_ref.dxmax)/2 + (abc_1.dxmin + abc_1.dxmax)/2, 
+                        - (rec_ref.dymin + rec_ref.dxmax)/2 + (abc_1.dymin + abc_1.dymax)/2 + 1.25)
+                    )
+        remain = gf.boolean(top_ref, rec_ref, '-', layer=(5,0))
+        remain_ref = canvas_qubit << remain
+
+    canvas_qubit.add_ports(xmon_ref.ports)
+    canvas_qubit.info['resonator_ymax'] = resonator_ymax
+    canvas_qubit.info.update(dict(my_resonator.info))
+    return canvas_qubit
+
+@cached_cell(depends=library_stamp)
+@profiled
+def feedlines(
+        resonator_ymax,
+        drive_center,
+        drive2_center,
+        overall_portWidth = 10,
+        route_radius = 60,
+        tranmission_width = 20,
+        tranmission_tunnel_width = 12,
+        tranmission_resonator_offset = 4,
 
-    ######################################
-    # qubit and resonator finished
-    ######################################
+        tranmission_width_drive = 10 ,
+        tranmission_tunnel_width_drive = 6,
+        tranmission_width_flux = 10 ,
+        tranmission_tunnel_width_flux = 5,
+        max_sagitta = None,
+):
+    # boundary, pads, the readout line and both drive lines
+    # only the resonator top and the xmon port positions are taken from qudit_core
+    canvas_qubit = gf.Component()
+    xmon_ports = gf.Component()
+    xmon_ports.add_port(name='drive', center=drive_center, width=11, orientation=0, layer=(5,0))
+    xmon_ports.add_port(name='drive2', center=drive2_center, width=11, orientation=180, layer=(5,0))
 
     # creating the boundary box to hold everything
     boundary = canvas_qubit << gf.components.rectangle(size=(5000, 5000), layer=(703, 0), centered=True, port_type='optical')
@@ -387,22 +312,14 @@ def qubit(
     # pad = gf.read.import_gds(gdspath='pad.gds')
 
     # left
-    pad = gf.read.import_gds(gdspath='pad2.gds')
-
-
-    pad.add_port('back', center=[pad.dxmin,(pad.dymax + pad.dymin)/2], layer=(5,0), width=10, orientation=180)
-    pad.add_port('front', center=[pad.dxmax,(pad.dymax + pad.dymin)/2], layer = (5,0), width=10, orientation=0)
+    pad = get_pad('pad2.gds')
 
     left_pad = canvas_qubit << pad
     left_pad.connect("back", canvas_qubit.ports['left'], allow_layer_mismatch=True)
 
 
     # tenporary drive for second qudit
-    pad = gf.read.import_gds(gdspath='pad2.gds')
-
-
-    pad.add_port('back', center=[pad.dxmin,(pad.dymax + pad.dymin)/2], layer=(5,0), width=10, orientation=180)
-    pad.add_port('front', center=[pad.dxmax,(pad.dymax + pad.dymin)/2], layer = (5,0), width=10, orientation=0)
+    pad = get_pad('pad2.gds')
 
     left_pad2 = canvas_qubit << pad
     left_pad2.connect("back", canvas_qubit.ports['bot'], allow_layer_mismatch=True)
@@ -419,10 +336,7 @@ def qubit(
     # bot_pad = canvas_qubit << pad
     # bot_pad.connect("back", canvas_qubit.ports['bot'], allow_layer_mismatch=True)
 
-    pad = gf.read.import_gds(gdspath='pad_transmission2.gds')
-
-    pad.add_port('back', center=[pad.dxmin,(pad.dymax + pad.dymin)/2], layer=(5,0), width=10, orientation=180)
-    pad.add_port('front', center=[pad.dxmax,(pad.dymax + pad.dymin)/2], layer = (5,0), width=10, orientation=0)
+    pad = get_pad('pad_transmission2.gds')
 
     top_pad = canvas_qubit << pad
     top_pad.connect("back", canvas_qubit.ports['top'], allow_layer_mismatch=True)
@@ -435,38 +349,16 @@ def qubit(
 
 
     # transmission line
-    inner = gf.Component()
-    outer = gf.Component()
-    xs_1 = gf.cross_section.cross_section(width=tranmission_width, layer=(5,0))
-    xs_2 = gf.cross_section.cross_section(width=tranmission_width + 2*tranmission_tunnel_width, layer=(5,0))
-
-
     tranmission_turn = 800
     y_pos = resonator_ymax + tranmission_turn - 500
     y_pos2 = resonator_ymax + tranmission_width/2 + tranmission_tunnel_width + tranmission_resonator_offset
 
-    route_inner = gf.routing.route_single_from_steps(
-        inner, 
+    tunnel = cpw_route(
         port1 = top_pad.ports['front'],
         port2 = right_pad.ports['front'],
-        allow_width_mismatch = False,
-        cross_section = xs_1,
-        steps = [
-            {"x": 0, "y": y_pos},
-            {"x": -1000, "y": y_pos},
-            {"x": -1000, "y": y_pos2},
-            {"x": y_pos2, "y": y_pos2},
-            {"x": y_pos2, "y": 0},
-        ],
+        width = tranmission_width,
+        gap = tranmission_tunnel_width,
         radius = route_radius,
-    )
-
-    route_outer = gf.routing.route_single_from_steps(
-        outer, 
-        port1 = top_pad.ports['front'],
-        port2 = right_pad.ports['front'],
-        allow_width_mismatch = False,
-        cross_section = xs_2,
         steps = [
             {"x": 0, "y": y_pos},
             {"x": -1000, "y": y_pos},
@@ -474,10 +366,9 @@ def qubit(
             {"x": y_pos2, "y": y_pos2},
             {"x": y_pos2, "y": 0},
         ],
-        radius = route_radius,
+        allow_width_mismatch = False,
+        max_sagitta = max_sagitta,
     )
-
-    tunnel = gf.boolean(A=outer, B = inner, operation='A-B', layer=(5,0))
     tunnel_ref = canvas_qubit << tunnel
 
 
@@ -510,120 +401,44 @@ def qubit(
 
 
     # Drive line
-    drive_xmon = gf.read.import_gds(gdspath='drive-xmon.gds')
-    drive_xmon.add_port('back', center=[drive_xmon.dxmin,(drive_xmon.dymax + drive_xmon.dymin)/2], layer=(5,0), width=10, orientation=180)
-    drive_xmon.add_port('front', center=[drive_xmon.dxmax,(drive_xmon.dymax + drive_xmon.dymin)/2], layer = (5,0), width=10, orientation=180)
+    drive_xmon = get_pad('drive-xmon.gds')
     drive_xmon_ref = canvas_qubit << drive_xmon
-    drive_xmon_ref.connect("front", xmon_ref.ports['drive'], allow_layer_mismatch=True, allow_width_mismatch=True)
-
-    inner = gf.Component()
-    outer = gf.Component()
-    bridge = gf.Component()
-    xs_1 = gf.cross_section.cross_section(width=tranmission_width_drive, layer=(5,0))
-    via = ComponentAlongPath(
-        component= air_bridge(22),spacing=100, padding=2, offset=0,
-    )
-    xs_2 = gf.cross_section.cross_section(width=tranmission_width_drive + 2*tranmission_tunnel_width_drive, layer=(5,0))
+    drive_xmon_ref.connect("front", xmon_ports.ports['drive'], allow_layer_mismatch=True, allow_width_mismatch=True)
 
-    xs_3_Section = gf.Section(width=tranmission_tunnel_width_drive+2*tranmission_tunnel_width_drive, layer=(5,0), port_names=('o1', 'o2'))
-    xs_3 = gf.CrossSection(sections=[xs_3_Section], components_along_path=[via])
-
-
-    route_inner = gf.routing.route_single(
-        inner, 
+    drive_tunnel = cpw_route(
         port1 = left_pad.ports['front'],
         port2 = drive_xmon_ref.ports['back'],
-        allow_width_mismatch = True,
-        cross_section = xs_1,
+        width = tranmission_width_drive,
+        gap = tranmission_tunnel_width_drive,
         radius = route_radius,
+        bridge = air_bridge(22),
+        bridge_spacing = 100,
+        bridge_padding = 2,
+        max_sagitta = max_sagitta,
     )
-
-    route_outer = gf.routing.route_single(
-        outer, 
-        port1 = left_pad.ports['front'],
-        port2 = drive_xmon_ref.ports['back'],
-        allow_width_mismatch = True,
-        cross_section = xs_2,
-        radius = route_radius,
-    )
-    route_bridge = gf.routing.route_single(
-        bridge, 
-        port1 = left_pad.ports['front'],
-        port2 = drive_xmon_ref.ports['back'],
-        allow_width_mismatch = True,
-        cross_section = xs_3,
-        radius = route_radius,
-
-    )
-
-
-
-    drive_tunnel = gf.boolean(A=outer, B = inner, operation='A-B', layer=(5,0))
     drive_tunnel_ref = canvas_qubit << drive_tunnel
 
-    extracted = bridge.extract(layers=((30, 0), (31,0),))
-    extracted.name = 'extracted'
-    canvas_qubit << extracted
-
 
 
     # 2nd Drive line
-    drive_xmon = gf.read.import_gds(gdspath='drive-xmon.gds')
-    drive_xmon.add_port('back', center=[drive_xmon.dxmin,(drive_xmon.dymax + drive_xmon.dymin)/2], layer=(5,0), width=10, orientation=180)
-    drive_xmon.add_port('front', center=[drive_xmon.dxmax,(drive_xmon.dymax + drive_xmon.dymin)/2], layer = (5,0), width=10, orientation=180)
+    drive_xmon = get_pad('drive-xmon.gds')
     drive_xmon_ref = canvas_qubit << drive_xmon
-    drive_xmon_ref.connect("front", xmon_ref2.ports['drive2'], allow_layer_mismatch=True, allow_width_mismatch=True)
-
-
-    inner = gf.Component()
-    outer = gf.Component()
-    bridge = gf.Component()
-    xs_1 = gf.cross_section.cross_section(width=tranmission_width_drive, layer=(5,0))
-    via = ComponentAlongPath(
-        component= air_bridge(28),spacing=100, padding=2, offset=0,
-    )
-    xs_2 = gf.cross_section.cross_section(width=tranmission_width_drive + 2*tranmission_tunnel_width_drive, layer=(5,0))
+    drive_xmon_ref.connect("front", xmon_ports.ports['drive2'], allow_layer_mismatch=True, allow_width_mismatch=True)
 
-    xs_3_Section = gf.Section(width=tranmission_tunnel_width_drive+2*tranmission_tunnel_width_drive, layer=(5,0), port_names=('o1', 'o2'))
-    xs_3 = gf.CrossSection(sections=[xs_3_Section], components_along_path=[via])
 
-
-    route_inner = gf.routing.route_single(
-        inner, 
+    drive_tunnel = cpw_route(
         port1 = left_pad2.ports['front'],
         port2 = drive_xmon_ref.ports['back'],
-        allow_width_mismatch = True,
-        cross_section = xs_1,
+        width = tranmission_width_drive,
+        gap = tranmission_tunnel_width_drive,
         radius = route_radius,
+        bridge = air_bridge(28),
+        bridge_spacing = 100,
+        bridge_padding = 2,
+        max_sagitta = max_sagitta,
     )
-
-    route_outer = gf.routing.route_single(
-        outer, 
-        port1 = left_pad2.ports['front'],
-        port2 = drive_xmon_ref.ports['back'],
-        allow_width_mismatch = True,
-        cross_section = xs_2,
-        radius = route_radius,
-    )
-    route_bridge = gf.routing.route_single(
-        bridge, 
-        port1 = left_pad2.ports['front'],
-        port2 = drive_xmon_ref.ports['back'],
-        allow_width_mismatch = True,
-        cross_section = xs_3,
-        radius = route_radius,
-
-    )
-
-
-
-    drive_tunnel = gf.boolean(A=outer, B = inner, operation='A-B', layer=(5,0))
     drive_tunnel_ref = canvas_qubit << drive_tunnel
 
-    extracted = bridge.extract(layers=((30, 0), (31,0),))
-    extracted.name = 'extracted'
-    canvas_qubit << extracted
-
 
 
 
@@ -685,11 +500,14 @@ def qubit(
     # extracted.name = 'extracted'
     # canvas_qubit << extracted
 
+    return canvas_qubit
 
+@cached_cell
+@profiled
+def jj_pair(JJ_width = 0.230, JJ_width2 = 0.230, xmon_spacing = 20, xmon_length = 450):
+    # the two junctions of the SQUID and their (55,0) patches, in the qudit_core frame
+    canvas_qubit = gf.Component()
 
-
-
-    extrusion = extrusion
     jj = JJ(JJ_width, total_length=xmon_spacing)
     jj2 = JJ(JJ_width2, total_length=xmon_spacing)
     jj_ref1 = canvas_qubit << jj
@@ -722,48 +540,104 @@ def qubit(
        jj_ref1.dymin - bot_rectangle_ref.dymax
     ))
 
+    return canvas_qubit
 
-    # adding second JJ
-    extrusion = extrusion
-    jj = JJ(JJ_width, total_length=xmon_spacing)
-    jj2 = JJ(JJ_width2, total_length=xmon_spacing)
-    jj_ref1 = canvas_qubit << jj
-    jj_ref2 = canvas_qubit << jj2
-    jj_ref1.rotate(-90)
-    jj_ref2.rotate(-90)
-    jj_ref2.dmovex(20)
-    
-    jj_ref1.dmove(( 
-        0 - jj_ref1.x-10+qubit_spacing,
-        jj_ref1.dymax-xmon_length/2 - 1
-    ))
-    jj_ref2.dmove(( 
-        0 - jj_ref2.x+10+qubit_spacing,
-        jj_ref2.dymax-xmon_length/2 - 1
-    )) 
-   
-    top_rectangle = gf.components.rectangle(size=(jj_ref2.dxmax - jj_ref1.dxmin, 3), layer=(55, 0))
-    bot_rectangle = gf.components.rectangle(size=(jj_ref2.dxmax - jj_ref1.dxmin, 3), layer=(55, 0))
-    top_rectangle_ref = canvas_qubit << top_rectangle
-    bot_rectangle_ref = canvas_qubit << bot_rectangle
-    top_rectangle_ref_center = [(top_rectangle_ref.dxmax + top_rectangle_ref.dxmin)/2,(top_rectangle_ref.dymax + top_rectangle_ref.dymin)/2 ]
-    bot_rectangle_ref_center = [(bot_rectangle_ref.dxmax + bot_rectangle_ref.dxmin)/2,(bot_rectangle_ref.dymax + bot_rectangle_ref.dymin)/2 ]
-    top_rectangle_ref.dmove((
-       (jj_ref1.dxmax + jj_ref2.dxmin)/2 - top_rectangle_ref_center[0] ,
-       jj_ref1.dymax - top_rectangle_ref.dymin
-    ))
-    bot_rectangle_ref.dmove((
-       (jj_ref1.dxmax + jj_ref2.dxmin)/2 - top_rectangle_ref_center[0] ,
-       jj_ref1.dymin - bot_rectangle_ref.dymax
-    ))
+@cached_cell
+@profiled
+def qudit_cell(
+        xmon_length = 450,
+        xmon_width = 48,
+        xmon_spacing = 20,
+        readout_connector_spacing = 4,
+        readout_tunnel_width = 5,
+        readout_connector_metal_spacing = 15,
+        drive_port_spacing = 4,
+        flux_port_spacing = 3,
+        top_connector_depth = 90,
+        max_sagitta = None,
+        JJ_width = 0.230,
+        JJ_width2 = 0.230,
+):
+    # one qudit of the chain, qudit_core and its junctions, for qudit_array
+    c = gf.Component()
+    core = qudit_core(
+        xmon_length=xmon_length, xmon_width=xmon_width, xmon_spacing=xmon_spacing,
+        readout_connector_spacing=readout_connector_spacing, readout_tunnel_width=readout_tunnel_width,
+        readout_connector_metal_spacing=readout_connector_metal_spacing,
+        drive_port_spacing=drive_port_spacing, flux_port_spacing=flux_port_spacing,
+        top_connector_depth=top_connector_depth, max_sagitta=max_sagitta,
+    )
+    c << core
+    c << jj_pair(JJ_width=JJ_width, JJ_width2=JJ_width2, xmon_spacing=xmon_spacing, xmon_length=xmon_length)
+    c.add_ports(core.ports)
+    c.info.update(dict(core.info))
+    return c
+
+@profiled
+def qubit(
+        xmon_length = 450,
+        xmon_width = 48, 
+        xmon_spacing = 20,
+        readout_connector_spacing = 4,
+        readout_tunnel_width = 5,
+        readout_connector_metal_spacing = 15,
+        drive_port_spacing = 4,
+        flux_port_spacing = 3,
+        overall_portWidth = 10,
+        route_radius = 60,
+        tranmission_width = 20,
+        tranmission_tunnel_width = 12,
+        tranmission_resonator_offset = 4,
+
+        tranmission_width_drive = 10 ,
+        tranmission_tunnel_width_drive = 6,
+        tranmission_width_flux = 10 ,
+        tranmission_tunnel_width_flux = 5,
+        JJ_width = 0.230,
+        JJ_width2 = 0.230,
+        extrusion  = 4,
 
+        coupled_spacing = 10,
 
+        top_connector_depth = 90,
+        max_sagitta = None,
+):
+    # max_sagitta: arc tolerance of the resonators and the routed bends in database units of write(), see qudit.qubit
+    unit_convert = 1e3
 
+    # main canvas that holds everything
+    # every sub-cell is cached on its own parameters, so changing e.g. JJ_width only rebuilds jj_pair
+    canvas_qubit = gf.Component()
 
-    sss = canvas_qubit.extract(layers=((1,0)))
-    remap = sss.remap_layers({(1, 0): (5, 0)})
-    removed = canvas_qubit.remove_layers(layers=(1,0))
-    canvas_qubit.add_ref(remap)
+    spec = dict(
+        xmon_length=xmon_length, xmon_width=xmon_width, xmon_spacing=xmon_spacing,
+        readout_connector_spacing=readout_connector_spacing, readout_tunnel_width=readout_tunnel_width,
+        readout_connector_metal_spacing=readout_connector_metal_spacing,
+        drive_port_spacing=drive_port_spacing, flux_port_spacing=flux_port_spacing,
+        max_sagitta=max_sagitta, JJ_width=JJ_width, JJ_width2=JJ_width2,
+    )
+    # the second connector is built from the depth returned by the first top_connector_mod call
+    array = qudit_array(
+        [
+            dict(spec, top_connector_depth=top_connector_depth),
+            dict(spec, top_connector_depth=top_connector_depth + readout_tunnel_width + readout_connector_metal_spacing),
+        ],
+        topology='line', coupled_spacing=coupled_spacing, cell=qudit_cell, feedline=False,
+    )
+    array_ref = canvas_qubit << array
+
+    lines = feedlines(
+        resonator_ymax=array.info['resonator_ymax'][0],
+        drive_center=tuple(array.ports['drive_0'].dcenter),
+        drive2_center=tuple(array.ports['drive_1'].dcenter),
+        overall_portWidth=overall_portWidth, route_radius=route_radius,
+        tranmission_width=tranmission_width, tranmission_tunnel_width=tranmission_tunnel_width,
+        tranmission_resonator_offset=tranmission_resonator_offset,
+        tranmission_width_drive=tranmission_width_drive, tranmission_tunnel_width_drive=tranmission_tunnel_width_drive,
+        tranmission_width_flux=tranmission_width_flux, tranmission_tunnel_width_flux=tranmission_tunnel_width_flux,
+        max_sagitta=max_sagitta,
+    )
+    lines_ref = canvas_qubit << lines
 
     rotated = gf.Component()
     qudit_ref = rotated << canvas_qubit
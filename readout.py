@@ -0,0 +1,64 @@
+import numpy as np
+
+# dispersive readout discrimination, the comparison of test.py over whole grids
+# with the qubit in |g> or |e> the resonator sits at f_r -+ chi; chi, kappa (linewidth, FWHM) and the probe offset
+# from f_r are in Hz, like circuit.calculate_params
+# every function broadcasts, grid() spreads 1d axes over orthogonal dimensions
+tau = 1e-6  # integration time, s
+efficiency = 1  # measurement efficiency
+n_photons = 1  # photons in the resonator when driven on its resonance
+
+
+def lorentzian(f, f0, gamma):
+    # the intensity lineshape of test.py, peak 1, gamma is the FWHM
+    return (gamma/2)**2 / ((f - f0)**2 + (gamma/2)**2)
+
+
+def grid(*axes):
+    # orthogonal views of 1d axes: grid(chi, kappa, offset) broadcasts to len(chi) x len(kappa) x len(offset)
+    axes = [np.asarray(axis, dtype=float) for axis in axes]
+    return [axis.reshape([-1 if i == j else 1 for j in range(len(axes))]) for i, axis in enumerate(axes)]
+
+
+def overlap(chi, kappa):
+    # overlap integral of the two normalized Lorentzians, 1 for identical lines, 0 for separated ones
+    # the overlap of Lorentzians is a Lorentzian of twice the width, so no integration over f is needed
+    return kappa**2 / (kappa**2 + 4*chi**2)
+
+
+def response(offset, center, kappa):
+    # complex field of the resonator driven at offset, relative to the field on resonance
+    return (kappa/2) / (kappa/2 + 1j*(offset - center))
+
+
+def separation(chi, kappa, offset=0):
+    # distance between the |g> and |e> responses at the probe offset, 2 at most
+    # largest halfway between the lines while they overlap, near each line once chi exceeds about kappa/2
+    return np.abs(response(offset, -chi, kappa) - response(offset, chi, kappa))
+
+
+def snr(chi, kappa, offset=0, tau=tau, efficiency=efficiency, n_photons=n_photons):
+    # homodyne signal-to-noise ratio along the separation: 2 |alpha_g - alpha_e| sqrt(efficiency kappa tau),
+    # kappa in rad/s and the field in sqrt(photons), as the signal difference over the vacuum noise of one record
+    return 2*np.sqrt(n_photons)*separation(chi, kappa, offset)*np.sqrt(efficiency*2*np.pi*kappa*tau)
+
+
+def discrimination(chi, kappa, offset=0, tau=tau, efficiency=efficiency, n_photons=n_photons):
+    # all metrics, chi may be signed (circuit.dispersive_shift is negative below the resonator)
+    chi = np.abs(chi)
+    return dict(
+        overlap=overlap(chi, kappa),
+        separation=separation(chi, kappa, offset),
+        snr=snr(chi, kappa, offset, tau, efficiency, n_photons),
+    )
+
+
+def screen(chi, kappa, offset=0, min_snr=None, max_overlap=None, **kwargs):
+    # metrics of a batch of designs and a mask of those meeting the limits that are given
+    metrics = discrimination(chi, kappa, offset, **kwargs)
+    ok = np.ones(np.shape(metrics['snr']), dtype=bool)
+    if min_snr is not None:
+        ok &= metrics['snr'] >= min_snr
+    if max_overlap is not None:
+        ok &= metrics['overlap'] <= max_overlap
+    return metrics, ok
@@ -0,0 +1,89 @@
+import numpy as np
+
+# closed form of the meander drawn by create_resonator() in the layout modules,
+# no gdsfactory objects are created so the solver can run over whole arrays of targets
+c = 299792458
+first_cycle_straight = 100
+tail_straight = 180
+# outer edge of the resonator gaps from the centre line, resonator_width/2 + tunnel_width in resonator()
+edge_offset = 11
+# database unit of write(), max_sagitta is counted in it
+dbu = 0.0005
+
+
+def arc_length(radius, angle, npoints=100):
+    # gf.path.arc draws npoints points, the path length is the length of that polyline
+    segments = npoints - 1
+    return 2*radius*np.sin(np.radians(angle)/(2*segments))*segments
+
+
+def arc_step(radius, max_sagitta, offset=0):
+    # largest angle (rad) of one chord that stays within max_sagitta database units of the circle,
+    # taken at radius + offset: the outer edge of an extruded cross section deviates most
+    outer = np.asarray(radius, dtype=float) + offset
+    return 2*np.arccos(np.clip(1 - max_sagitta*dbu/outer, -1, 1))
+
+
+def arc_npoints(radius, angle, max_sagitta=None, offset=0, npoints=100):
+    # points of gf.path.arc: the fixed npoints, or the fewest meeting max_sagitta
+    if max_sagitta is None:
+        return npoints
+    return np.ceil(np.radians(abs(angle))/arc_step(radius, max_sagitta, offset)).astype(int) + 1
+
+
+def euler_npoints(radius, angle=90, max_sagitta=None, offset=0, p=0.5):
+    # npoints of gf.path.euler (points of each half of the bend), None for the gdsfactory default
+    # the bend is radius*angle*(1 + p) long with points evenly spread along it and radius is its tightest curvature
+    if max_sagitta is None:
+        return None
+    step = radius*arc_step(radius, max_sagitta, offset)
+    return int(np.ceil(radius*np.radians(abs(angle))*(1 + p)/2/step)) + 1
+
+
+def meander_constant(radius, number_of_cycle, top_connector_depth=0, npoints=100, max_sagitta=None):
+    # everything in the path length that does not scale with length:
+    # 2n-1 half turns, the two quarter turns of the first cycle and the quarter turn of the tail
+    half_turn = arc_length(radius, 180, arc_npoints(radius, 180, max_sagitta, edge_offset, npoints))
+    quarter_turn = arc_length(radius, 90, arc_npoints(radius, 90, max_sagitta, edge_offset, npoints))
+    return ((2*number_of_cycle - 1)*half_turn + 3*quarter_turn
+            + first_cycle_straight + tail_straight - radius + top_connector_depth)
+
+
+def meander_length(length, radius=30, number_of_cycle=5, top_connector_depth=0, npoints=100, max_sagitta=None):
+    # create_resonator(length, radius, number_of_cycle, max_sagitta).length() + top_connector_depth, in um
+    length = np.asarray(length, dtype=float)
+    number_of_cycle = np.floor(number_of_cycle)
+    return (2*number_of_cycle*length + length//2
+            + meander_constant(radius, number_of_cycle, top_connector_depth, npoints, max_sagitta))
+
+
+def meander_frequency(epsilon_eff, length, radius=30, number_of_cycle=5, top_connector_depth=0, npoints=100, max_sagitta=None):
+    path_length = meander_length(length, radius, number_of_cycle, top_connector_depth, npoints, max_sagitta)*1e-6
+    return c/(np.sqrt(epsilon_eff)*4*path_length)
+
+
+def solve_meander(frequency, epsilon_eff, radius=30, top_connector_depth=80, number_of_cycle=None, max_length=300, npoints=100, max_sagitta=None):
+    # straight section length (and number of cycles) of the meander resonating at frequency
+    # number_of_cycle=None picks the fewest cycles whose straight sections fit in max_length
+    # returns (length, number_of_cycle), length is nan where no meander with a tail fits (length < 2*radius)
+    frequency, epsilon_eff, radius, top_connector_depth = np.broadcast_arrays(
+        np.asarray(frequency, dtype=float), epsilon_eff, radius, top_connector_depth)
+    target = c/(4*frequency*np.sqrt(epsilon_eff))*1e6
+
+    if number_of_cycle is None:
+        half_turn = arc_length(radius, 180, arc_npoints(radius, 180, max_sagitta, edge_offset, npoints))
+        per_cycle = 2*max_length + 2*half_turn
+        rest = target - (max_length//2 + meander_constant(radius, 0, top_connector_depth, npoints, max_sagitta))
+        number_of_cycle = np.maximum(np.ceil(rest/per_cycle), 1)
+    number_of_cycle = np.broadcast_to(np.floor(number_of_cycle), target.shape).astype(float)
+
+    # length = 2k + u with 0 <= u < 2 makes length//2 = k, so the path length is (4n+1)k + 2nu + constant
+    remainder = target - meander_constant(radius, number_of_cycle, top_connector_depth, npoints, max_sagitta)
+    k = np.floor(remainder/(4*number_of_cycle + 1))
+    # targets in the 1 um jump of length//2 land on the next even length
+    u = np.minimum((remainder - (4*number_of_cycle + 1)*k)/(2*number_of_cycle), 2)
+    length = 2*k + u
+    length = np.where(length >= 2*radius, length, np.nan)
+    if length.ndim == 0:
+        return length.item(), int(number_of_cycle)
+    return length, number_of_cycle.astype(int)
@@ -0,0 +1,129 @@
+import importlib
+import inspect
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+import inverse_design
+from cell_cache import canonical, layout_hash, param_hash
+from pads import library_stamp
+from resonator_model import meander_length
+
+# sweep results in SQLite, one row per built variant, keyed by the hash of the module, its full qubit() parameters
+# and the state of the layout source and pad files, so a repeated request is served without a rebuild
+package_dir = Path(__file__).parent
+db_path = package_dir / 'build' / 'results.sqlite'
+
+# scalar columns, everything else of a row is stored as JSON
+columns = dict(
+    module='TEXT',
+    gdspath='TEXT',
+    is_DRC='INTEGER',
+    build_time='REAL',
+    extract_time='REAL',
+    drc_time='REAL',
+    write_time='REAL',
+    polygons='INTEGER',
+    drc_clean='INTEGER',
+    path_length='REAL',
+    resonator_f='REAL',
+    qubit_f='REAL',
+    anharmonicity='REAL',
+    chi='REAL',
+    kappa='REAL',
+    c_q='REAL',
+    c_g='REAL',
+)
+json_columns = ('params', 'polygons_per_layer', 'bbox', 'drc', 'capacitance')
+indexed = ('module', 'resonator_f', 'qubit_f', 'path_length')
+
+
+def full_params(module, params):
+    # qubit() parameters with the defaults filled in, so explicit defaults and omitted ones share a key
+    layout = importlib.import_module(module)
+    bound = inspect.signature(layout.qubit).bind(**params)
+    bound.apply_defaults()
+    return canonical(dict(bound.arguments))
+
+
+def variant_key(module, params, is_DRC=True):
+    # the sources of the layout module and of every module it draws with (cell_cache.layout_hash)
+    return param_hash(module, full_params(module, params), [layout_hash(module), library_stamp(), is_DRC])
+
+
+def physics(params, capacitance=None):
+    # resonator path length and the circuit parameters inverse_design predicts for the drawn geometry,
+    # empty for layouts without these parameters
+    # capacitance: the extracted capacitances of the row (sweep.build_variant), used instead of the reference scaling
+    names = ('xmon_length', 'top_connector_depth', 'JJ_width', 'JJ_width2', 'resoantor_length')
+    if any(name not in params for name in names):
+        return {}
+    geometry = dict(inverse_design.base_params, **params)
+    extracted = None if capacitance is None else (capacitance['c_q'][0], capacitance['c_g'][0])
+    predicted = inverse_design.predict(*(params[name] for name in names), params=geometry, extracted=extracted)
+    path_length = meander_length(
+        params['resoantor_length'], inverse_design.resonator_radius, inverse_design.number_of_cycle,
+        inverse_design.connector_length(params['top_connector_depth'], geometry), max_sagitta=params.get('max_sagitta'),
+    )
+    return dict({name: float(value) for name, value in predicted.items()}, path_length=float(path_length))
+
+
+class ResultStore:
+    def __init__(self, path=None):
+        self.path = Path(path or db_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        # readers (notebooks) do not block the sweep writing
+        self.db.execute('PRAGMA journal_mode=WAL')
+        fields = ', '.join([f'{name} {kind}' for name, kind in columns.items()] + [f'{name} TEXT' for name in json_columns])
+        self.db.execute(f'CREATE TABLE IF NOT EXISTS variants (key TEXT PRIMARY KEY, {fields}, created REAL)')
+        # stores written before a column was added get it empty
+        existing = {record['name'] for record in self.db.execute('PRAGMA table_info(variants)')}
+        for name, kind in list(columns.items()) + [(name, 'TEXT') for name in json_columns]:
+            if name not in existing:
+                self.db.execute(f'ALTER TABLE variants ADD COLUMN {name} {kind}')
+        for name in indexed:
+            self.db.execute(f'CREATE INDEX IF NOT EXISTS variants_{name} ON variants ({name})')
+        self.db.commit()
+
+    def put(self, key, row):
+        values = dict(key=key, created=time.time())
+        for name in columns:
+            value = row.get(name)
+            values[name] = value.item() if isinstance(value, np.generic) else value
+        for name in json_columns:
+            values[name] = json.dumps(row.get(name))
+        names = ', '.join(values)
+        self.db.execute(f'INSERT OR REPLACE INTO variants ({names}) VALUES ({", ".join("?"*len(values))})', list(values.values()))
+        self.db.commit()
+
+    def decode(self, record):
+        row = dict(record)
+        for name in json_columns:
+            row[name] = json.loads(row[name]) if row[name] is not None else None
+        return row
+
+    def get(self, key):
+        record = self.db.execute('SELECT * FROM variants WHERE key = ?', (key,)).fetchone()
+        return None if record is None else self.decode(record)
+
+    def query(self, where=None, args=(), order=None, limit=None):
+        # where is SQL on the columns, parameters are reachable as json_extract(params, '$.JJ_width')
+        sql = 'SELECT * FROM variants'
+        if where:
+            sql += f' WHERE {where}'
+        if order:
+            sql += f' ORDER BY {order}'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        return [self.decode(record) for record in self.db.execute(sql, args)]
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM variants').fetchone()[0]
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,91 @@
+import numpy as np
+
+import circuit
+from inverse_design import finger_bounds, jj_step
+
+# flux tuning of the asymmetric SQUID, calculate_params_asymmetric of physics.ipynb over whole batches
+# every argument broadcasts (junction widths, c_q, J_c, ratio, phi_e), readout.grid spreads 1d axes over
+# orthogonal dimensions; phi_e is the phase of physics.ipynb, the junction energy goes as cos(phi_e)
+# frequencies in Hz, energies in J, widths in um
+phi_points = 1000
+
+
+def snap_width(width, step=jj_step):
+    # the lithography grid, np.round(jj_width, 2) in physics.ipynb
+    return np.round(np.asarray(width)/step)*step
+
+
+def junction_widths(qubit_f, c_q, ratio, J_c=circuit.J_c):
+    # snapped widths of the two junctions for the upper sweet spot at qubit_f, ratio is the share of E_j in the first
+    E_c = circuit.charging_energy(c_q)
+    E_j = circuit.calculate_Ej(E_c, qubit_f)
+    JJ_width = snap_width(circuit.calculate_jj_width(E_j*ratio, J_c))
+    JJ_width2 = snap_width(circuit.calculate_jj_width(E_j*(1 - ratio), J_c))
+    return JJ_width, JJ_width2
+
+
+def asymmetry(JJ_width, JJ_width2):
+    # d = (E_j1 - E_j2)/(E_j1 + E_j2), the energies go with the widths
+    return (JJ_width - JJ_width2)/(JJ_width + JJ_width2)
+
+
+def josephson_energy(JJ_width, JJ_width2, phi_e, J_c=circuit.J_c):
+    E_j = circuit.calculate_Ej_from_width(JJ_width, J_c) + circuit.calculate_Ej_from_width(JJ_width2, J_c)
+    d = asymmetry(JJ_width, JJ_width2)
+    return E_j*np.sqrt(np.cos(phi_e)**2 + d**2*np.sin(phi_e)**2)
+
+
+def flux_surface(JJ_width, JJ_width2, c_q, phi_e=None, J_c=circuit.J_c, c_g=None, resonator_f=None):
+    # f01, f12 and E_j/E_c over phi_e, and chi when c_g and resonator_f are given
+    # phi_e=None is phi_points phases over [-pi, pi] on a new last axis
+    if phi_e is None:
+        phi_e = np.linspace(-np.pi, np.pi, phi_points)
+        JJ_width, JJ_width2, c_q, J_c, c_g, resonator_f = (
+            None if value is None else np.asarray(value)[..., np.newaxis]
+            for value in (JJ_width, JJ_width2, c_q, J_c, c_g, resonator_f)
+        )
+    E_c = circuit.charging_energy(c_q)
+    E_j = josephson_energy(JJ_width, JJ_width2, phi_e, J_c)
+    f01 = circuit.calculate_qubit_f(E_j, E_c)
+    surface = dict(phi_e=phi_e, f01=f01, f12=f01 - E_c/circuit.h, Ej_Ec=E_j/E_c)
+    if c_g is not None and resonator_f is not None:
+        surface['chi'] = dispersive_shift(f01, c_q, c_g, resonator_f)
+    return surface
+
+
+def dispersive_shift(qubit_f, c_q, c_g, resonator_f):
+    # chi of the qubit at qubit_f, as circuit.calculate_params
+    r_L, c_r = circuit.calculate_cr(resonator_f)
+    g = circuit.coupling_strength(c_g, c_q, c_r, resonator_f)
+    return circuit.dispersive_shift(g, resonator_f - qubit_f, circuit.charging_energy(c_q)/circuit.h_bar)
+
+
+def sweet_spots(JJ_width, JJ_width2, c_q, J_c=circuit.J_c):
+    # closed form: the upper sweet spot at phi_e = 0, the lower at phi_e = pi/2 where E_j drops to |d| of its sum
+    E_c = circuit.charging_energy(c_q)
+    return dict(
+        f_upper=circuit.calculate_qubit_f(josephson_energy(JJ_width, JJ_width2, 0, J_c), E_c),
+        f_lower=circuit.calculate_qubit_f(josephson_energy(JJ_width, JJ_width2, np.pi/2, J_c), E_c),
+    )
+
+
+def choose_junctions(qubit_f, c_q, lower_f=None, ratio=None, J_c=circuit.J_c, weight=1):
+    # JJ_width and JJ_width2 for qubit(): the upper sweet spot at qubit_f and, when given, the lower at lower_f
+    # ratio: candidate E_j shares (default 0.5 to 0.99), every candidate is snapped and checked against JJ()'s limits
+    # returns a dict of floats, or raises ValueError when no candidate fits
+    if ratio is None:
+        ratio = np.linspace(0.5, 0.99, 50000)
+    ratio = np.asarray(ratio, dtype=float)
+    JJ_width, JJ_width2 = junction_widths(qubit_f, c_q, ratio, J_c)
+    spots = sweet_spots(JJ_width, JJ_width2, c_q, J_c)
+    error = ((spots['f_upper'] - qubit_f)/qubit_f)**2
+    if lower_f is not None:
+        error = error + weight*((spots['f_lower'] - lower_f)/lower_f)**2
+    ok = np.ones(np.shape(error), dtype=bool)
+    for width in (JJ_width, JJ_width2):
+        ok &= (width >= finger_bounds[0]) & (width <= finger_bounds[1])
+    if not np.any(ok):
+        raise ValueError(f'no junction pair within {finger_bounds} um for qubit_f={qubit_f}')
+    index = np.argmin(np.where(ok, error, np.inf))
+    chosen = dict(JJ_width=JJ_width, JJ_width2=JJ_width2, ratio=ratio, **spots)
+    return {name: float(np.broadcast_to(value, error.shape).flat[index]) for name, value in chosen.items()}
@@ -0,0 +1,155 @@
+import datetime
+import struct
+import zlib
+
+# minimal GDSII and OASIS writers that put polygons on disk as they come,
+# so a layout never has to be held in memory as a whole to be written
+# points are integer database units, polygons are hole free hulls without the closing point
+
+
+def gds_real8(value):
+    # GDSII excess-64 base-16 real
+    if value == 0:
+        return bytes(8)
+    sign = 0x80 if value < 0 else 0
+    value = abs(value)
+    exponent = 64
+    while value >= 1:
+        value /= 16
+        exponent += 1
+    while value < 1/16:
+        value *= 16
+        exponent -= 1
+    mantissa = int(round(value * 2**56))
+    if mantissa >= 2**56:
+        mantissa //= 16
+        exponent += 1
+    return bytes([sign | exponent]) + mantissa.to_bytes(7, 'big')
+
+
+class GDSWriter:
+    # GDSII limits an XY record to 8191 points including the closing one, 8000 is KLayout's default
+    max_points = 8000
+
+    def __init__(self, path, dbu=0.001, libname='LIB'):
+        self.file = open(path, 'wb')
+        now = datetime.datetime.now()
+        self.timestamp = [now.year, now.month, now.day, now.hour, now.minute, now.second] * 2
+        self.record(0x0002, struct.pack('>h', 600))
+        self.record(0x0102, struct.pack('>12h', *self.timestamp))
+        self.record(0x0206, self.string(libname))
+        self.record(0x0305, gds_real8(dbu) + gds_real8(dbu*1e-6))
+
+    @staticmethod
+    def string(text):
+        data = text.encode('ascii')
+        return data + b'\0' if len(data) % 2 else data
+
+    def record(self, kind, data=b''):
+        self.file.write(struct.pack('>HH', len(data) + 4, kind) + data)
+
+    def begin_cell(self, name):
+        self.record(0x0502, struct.pack('>12h', *self.timestamp))
+        self.record(0x0606, self.string(name))
+
+    def polygon(self, layer, datatype, points):
+        points = list(points) + [points[0]]
+        self.record(0x0800)
+        self.record(0x0D02, struct.pack('>h', layer))
+        self.record(0x0E02, struct.pack('>h', datatype))
+        self.record(0x1003, struct.pack(f'>{2*len(points)}i', *(c for p in points for c in p)))
+        self.record(0x1100)
+
+    def end_cell(self):
+        self.record(0x0700)
+
+    def close(self):
+        self.record(0x0400)
+        self.file.close()
+
+
+def oas_uint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def oas_sint(value):
+    return oas_uint((abs(value) << 1) | (value < 0))
+
+
+def oas_string(text):
+    data = text.encode('ascii')
+    return oas_uint(len(data)) + data
+
+
+class OASISWriter:
+    # no limit on the point count, cells are written as CBLOCKs (deflate) when compress is set
+    max_points = None
+    # uncompressed bytes per CBLOCK
+    block_size = 1 << 20
+
+    def __init__(self, path, dbu=0.001, compress=True, level=6):
+        self.file = open(path, 'wb')
+        self.compress = compress
+        self.level = level
+        self.buffer = bytearray()
+        self.file.write(b'%SEMI-OASIS\r\n')
+        # START: version, grid steps per micron, tables in START (all empty)
+        self.file.write(b'\x01' + oas_string('1.0') + b'\x00' + oas_uint(round(1/dbu)) + b'\x00' + bytes(12))
+
+    def emit(self, data):
+        if not self.compress:
+            self.file.write(data)
+            return
+        self.buffer += data
+        if len(self.buffer) >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        deflate = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        packed = deflate.compress(bytes(self.buffer)) + deflate.flush()
+        self.file.write(b'\x22\x00' + oas_uint(len(self.buffer)) + oas_uint(len(packed)) + packed)
+        self.buffer = bytearray()
+
+    def begin_cell(self, name):
+        self.flush()
+        # CELL by name, positions in the cell start out absolute
+        self.file.write(b'\x0e' + oas_string(name))
+
+    def polygon(self, layer, datatype, points):
+        x0, y0 = points[0]
+        deltas = bytearray()
+        for (xa, ya), (xb, yb) in zip(points[:-1], points[1:]):
+            dx, dy = xb - xa, yb - ya
+            # g-delta, second form: |dx| with its sign in bit 1, then dy as a signed integer
+            deltas += oas_uint((abs(dx) << 2) | ((dx < 0) << 1) | 1) + oas_sint(dy)
+        # info byte 00PXYRDL: point list, x, y, datatype and layer present
+        self.emit(
+            b'\x15\x3b' + oas_uint(layer) + oas_uint(datatype)
+            + b'\x04' + oas_uint(len(points) - 1) + deltas
+            + oas_sint(x0) + oas_sint(y0)
+        )
+
+    def end_cell(self):
+        self.flush()
+
+    def close(self):
+        self.flush()
+        # END is padded to 256 bytes, no validation
+        self.file.write(b'\x02' + oas_uint(252) + bytes(252) + b'\x00')
+        self.file.close()
+
+
+def open_writer(path, dbu=0.001, compress=True):
+    if str(path).endswith('.oas'):
+        return OASISWriter(path, dbu=dbu, compress=compress)
+    return GDSWriter(path, dbu=dbu)
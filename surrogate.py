@@ -0,0 +1,161 @@
+import time
+
+import numpy as np
+
+import inverse_design
+from results_store import ResultStore, full_params
+from sweep import run_sweep
+
+# layout -> physics without a build: a cubic RBF with a linear tail over qubit() kwargs, fitted to variants built by
+# sweep.run_sweep and kept in the results store, of the capacitances extracted from their gaps (capacitance.py),
+# the resonator frequency and the resonator path length
+# the junction widths are not sampled, nothing recorded depends on them; physics() adds them through inverse_design
+# error estimate: the leave-one-out error of the fit (Rippa's formula, no refits), scaled by the distance to the
+# nearest sample over the typical sample spacing, unbounded outside the sampled box; query() builds when it is too large
+bounds = dict(
+    xmon_length=inverse_design.bounds['xmon_length'],
+    xmon_width=(30, 60),
+    top_connector_depth=inverse_design.bounds['top_connector_depth'],
+    resoantor_length=(100, 400),
+)
+outputs = ('c_q', 'c_g', 'resonator_f', 'path_length')
+tolerance = 0.01  # relative error above which query() builds
+# errors are relative to the value, or to this fraction of the mean magnitude of the output where the value is
+# smaller (an output that is zero, e.g. c_g of an uncoupled design, would give inf)
+error_floor = 0.01
+output_dir = 'build/surrogate'
+
+
+def latin_hypercube(n, dimensions, rng):
+    # one sample in each of n strata along every dimension, in the unit cube
+    strata = np.argsort(rng.random((dimensions, n)), axis=1).T
+    return (strata + rng.random((n, dimensions)))/n
+
+
+def sample_params(n, bounds=bounds, base_params=None, seed=0):
+    # n qubit() kwargs over bounds, at 0.1 um; candidates whose claw runs into the side arms are drawn again
+    rng = np.random.default_rng(seed)
+    base = dict(inverse_design.base_params, **(base_params or {}))
+    names = list(bounds)
+    low, high = np.array([bounds[name] for name in names], dtype=float).T
+    samples = []
+    while len(samples) < n:
+        x = np.round(low + latin_hypercube(n, len(names), rng)*(high - low), 1)
+        candidate = dict(base, **{name: x[:, i] for i, name in enumerate(names)})
+        ok = inverse_design.connector_clearance(candidate['xmon_length'], candidate['top_connector_depth'], candidate) >= candidate['readout_connector_spacing']
+        samples += [dict(base, **dict(zip(names, row))) for row in x[ok].tolist()]
+    return samples[:n]
+
+
+def distance(a, b):
+    return np.sqrt(((a[:, np.newaxis, :] - b[np.newaxis, :, :])**2).sum(axis=-1))
+
+
+class Surrogate:
+    # fitted to rows carrying the params and outputs (run_sweep rows with a store, or store rows)
+    # store: where query() puts the variants it builds, as in run_sweep
+    def __init__(self, rows, bounds=bounds, module='qudit', base_params=None, store=True):
+        self.names = list(bounds)
+        self.low, self.high = np.array([bounds[name] for name in self.names], dtype=float).T
+        self.module = module
+        self.base_params = dict(inverse_design.base_params, **(base_params or {}))
+        self.store = store
+        self.rows = []
+        self.add(rows)
+
+    @classmethod
+    def from_store(cls, store=True, bounds=bounds, module='qudit', base_params=None):
+        # every stored variant of module with extracted capacitances whose other parameters match base_params
+        results = ResultStore(None if store is True else store)
+        rows = results.query('module = ? AND capacitance IS NOT NULL AND c_q IS NOT NULL', (module,))
+        results.close()
+        reference = full_params(module, dict(inverse_design.base_params, **(base_params or {})))
+        fixed = [name for name in reference if name not in bounds]
+        rows = [row for row in rows if all(row['params'].get(name) == reference[name] for name in fixed)]
+        return cls(rows, bounds, module, base_params, store)
+
+    def unit(self, params):
+        # the sampled parameters of params (scalars or arrays) as points of the unit box, and their common shape
+        values = np.broadcast_arrays(*(np.asarray(params[name], dtype=float) for name in self.names))
+        x = (np.stack([value.ravel() for value in values], axis=1) - self.low)/(self.high - self.low)
+        return x, values[0].shape
+
+    def add(self, rows):
+        # more samples and a refit
+        self.rows += list(rows)
+        self.x = self.unit({name: [row['params'][name] for row in self.rows] for name in self.names})[0]
+        self.y = np.array([[row[name] for name in outputs] for row in self.rows], dtype=float)
+        n, d = self.x.shape
+        if n < d + 2:
+            raise ValueError(f'{n} samples cannot fit {d} parameters, sample at least {d + 2}')
+        P = np.hstack([np.ones((n, 1)), self.x])
+        system = np.block([[distance(self.x, self.x)**3, P], [P.T, np.zeros((d + 1, d + 1))]])
+        inverse = np.linalg.inv(system)
+        scale = np.abs(self.y).mean(axis=0)
+        self.scale = np.where(scale > 0, scale, 1)
+        self.coefficients = inverse[:, :n] @ (self.y/self.scale)
+        # residual of each sample left out of the fit is its coefficient over its diagonal of the inverse
+        left_out = self.coefficients[:n]/np.diag(inverse)[:n, np.newaxis]*self.scale
+        self.loo = np.sqrt(np.mean((left_out/np.maximum(np.abs(self.y), error_floor*self.scale))**2, axis=0))
+        spacing = distance(self.x, self.x) + np.diag(np.full(n, np.inf))
+        self.spacing = np.median(spacing.min(axis=1))
+
+    def evaluate(self, x):
+        # outputs at unit box points x (m, d) and their relative error estimate, both (m, len(outputs))
+        r = distance(x, self.x)
+        values = np.hstack([r**3, np.ones((len(x), 1)), x]) @ self.coefficients*self.scale
+        error = self.loo*(r.min(axis=1)/self.spacing)[:, np.newaxis]
+        error[np.any((x < 0) | (x > 1), axis=1)] = np.inf
+        return values, error
+
+    def predict(self, **params):
+        # ({output: value}, {output: relative error}) at params, the sampled names as scalars or broadcasting arrays
+        x, shape = self.unit(params)
+        values, error = self.evaluate(x)
+        return (
+            {name: values[:, i].reshape(shape) for i, name in enumerate(outputs)},
+            {name: error[:, i].reshape(shape) for i, name in enumerate(outputs)},
+        )
+
+    def physics(self, JJ_width, JJ_width2, q_ext=inverse_design.circuit.q_ext, **params):
+        # inverse_design.predict with the surrogate capacitances in place of the reference scaling
+        values, error = self.predict(**params)
+        geometry = dict(self.base_params, **params)
+        return inverse_design.predict(
+            geometry['xmon_length'], geometry['top_connector_depth'], JJ_width, JJ_width2, geometry['resoantor_length'],
+            q_ext=q_ext, params=geometry, extracted=(values['c_q'], values['c_g']),
+        )
+
+    def query(self, tolerance=tolerance, **params):
+        # one design: the surrogate values when every error estimate is within tolerance, otherwise the variant
+        # is built (run_sweep, so it lands in the store) and added to the fit; returns (values, built)
+        values, error = self.predict(**params)
+        if all(error[name] <= tolerance for name in outputs):
+            return {name: float(value) for name, value in values.items()}, False
+        rows = run_sweep([dict(self.base_params, **params)], module=self.module, output_dir=output_dir, drc=False, store=self.store)
+        if rows[0]['error'] is not None:
+            raise RuntimeError(f"building {params} failed: {rows[0]['error']}")
+        self.add(rows)
+        return {name: rows[0][name] for name in outputs}, True
+
+
+def sample(n, bounds=bounds, module='qudit', base_params=None, seed=0, store=True, max_workers=None):
+    # builds n sampled variants (those already in the store are served from it) and fits a Surrogate to them
+    # store: as run_sweep, but a store is needed, it computes the recorded physics
+    if store is False:
+        raise ValueError('the surrogate is fitted to the physics a results store records, store cannot be False')
+    variants = sample_params(n, bounds, base_params, seed)
+    rows = run_sweep(variants, module=module, output_dir=output_dir, max_workers=max_workers, drc=False, store=store)
+    return Surrogate([row for row in rows if row['error'] is None], bounds, module, base_params, store)
+
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    model = sample(60)
+    print(f'{len(model.rows)} samples in {time.perf_counter() - start:.1f}s')
+    for name, error in zip(outputs, model.loo):
+        print(f'# {name}: leave-one-out error {error:.2%}')
+    params = dict(xmon_length=420, xmon_width=40, top_connector_depth=120, resoantor_length=285)
+    start = time.perf_counter()
+    values, error = model.predict(**params)
+    print(f'query in {(time.perf_counter() - start)*1e6:.0f} us:', {name: f'{float(values[name]):.4g} +- {float(error[name]):.2%}' for name in outputs})
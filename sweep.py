@@ -0,0 +1,143 @@
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from cell_cache import param_hash
+
+# the layout modules read their pad files relative to the repository
+package_dir = Path(__file__).parent
+
+
+def parameter_grid(grid):
+    # {'JJ_width': [0.1, 0.2], 'top_connector_depth': [110, 120]} -> list of kwargs dicts
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def _init_worker():
+    os.chdir(package_dir)
+
+
+def build_variant(module, params, gdspath, is_DRC=True, drc=True, extract=True):
+    # runs in a worker process, returns one manifest row, with the telemetry events of the build
+    # drc: check the chip against drc_rules.yaml before it is written, markers go next to the gds
+    # extract: the capacitances of the xmon islands from the drawn gaps (capacitance.py)
+    import telemetry
+    from capacitance import qudit_capacitances
+    from export import polygon_counts, write
+    from drc import run_drc
+
+    layout = importlib.import_module(module)
+    start = time.perf_counter()
+    with telemetry.capture() as events:
+        qubit = layout.qubit(**params)
+    built = time.perf_counter()
+    capacitance = {name: value.tolist() for name, value in qudit_capacitances(qubit).items()} if extract else None
+    extracted = time.perf_counter()
+    violations = run_drc(qubit, report=Path(gdspath).with_suffix('.lyrdb')) if drc else None
+    checked = time.perf_counter()
+    final = write(qubit, is_DRC=is_DRC, gdspath=gdspath, show=False)
+    written = time.perf_counter()
+
+    counts = polygon_counts(final)
+    row = dict(
+        module=module,
+        params=params,
+        gdspath=str(gdspath),
+        build_time=built - start,
+        extract_time=extracted - built,
+        drc_time=checked - extracted,
+        write_time=written - checked,
+        drc=violations,
+        drc_clean=None if violations is None else not any(violations.values()),
+        polygons=sum(counts.values()),
+        polygons_per_layer=counts,
+        bbox=[[final.dxmin, final.dymin], [final.dxmax, final.dymax]],
+        capacitance=capacitance,
+        events=events,
+    )
+    # drop this variant's flattened chip, the cached sub-cells stay for the next variant
+    if qubit is not final:
+        qubit.delete()
+    final.delete()
+    return row
+
+
+def run_sweep(grid, module='qudit', base_params=None, output_dir='build/sweep', max_workers=None, is_DRC=True, drc=True, store=True, extract=True):
+    # grid: {name: values} for their product, or a list of kwargs dicts (e.g. the samples of surrogate.py)
+    # store: True for build/results.sqlite, a path for another results store, False to always rebuild
+    # variants already in the store (with their gds still on disk) are not rebuilt
+    # extract: the stored physics then come from the extracted capacitances instead of the reference scaling
+    from results_store import ResultStore, full_params, physics, variant_key
+
+    base_params = base_params or {}
+    output_dir = Path(output_dir)
+    if not output_dir.is_absolute():
+        output_dir = package_dir / output_dir
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    variants = [dict(base_params, **params) for params in (grid if isinstance(grid, list) else parameter_grid(grid))]
+    results = None
+    if store:
+        results = ResultStore(None if store is True else store)
+    # spawn, not fork: klayout state does not survive a fork reliably
+    context = multiprocessing.get_context('spawn')
+    rows = []
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=_init_worker) as pool:
+        futures = {}
+        for index, params in enumerate(variants):
+            name = f'{module}_{index:04d}_{param_hash(module, params)[:8]}'
+            key = variant_key(module, params, is_DRC) if results is not None else None
+            stored = results.get(key) if results is not None else None
+            if stored and Path(stored['gdspath']).exists() and (not drc or stored['drc'] is not None) and (not extract or stored['capacitance'] is not None):
+                rows.append(dict(stored, index=index, name=name, error=None, stored=True))
+                continue
+            gdspath = output_dir / f'{name}.gds'
+            futures[pool.submit(build_variant, module, params, gdspath, is_DRC, drc, extract)] = (index, name, key)
+        for future in as_completed(futures):
+            index, name, key = futures[future]
+            try:
+                row = future.result()
+                row['error'] = None
+            except Exception as error:
+                row = dict(module=module, params=variants[index], gdspath=None, error=repr(error))
+            row['index'] = index
+            row['name'] = name
+            row['stored'] = False
+            if results is not None and row['error'] is None:
+                row['params'] = full_params(module, variants[index])
+                row.update(physics(row['params'], row['capacitance']), is_DRC=is_DRC)
+                results.put(key, row)
+            rows.append(row)
+    if results is not None:
+        results.close()
+
+    rows.sort(key=lambda row: row['index'])
+    with open(output_dir / 'manifest.json', 'w') as f:
+        json.dump(rows, f, indent=2)
+    return rows
+
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    rows = run_sweep(
+        grid=dict(JJ_width=[0.12, 0.65], JJ_width2=[0.12, 0.65]),
+        module='qudit',
+        base_params=dict(
+            xmon_length=420, xmon_width=40, xmon_spacing=15,
+            readout_connector_spacing=4, readout_tunnel_width=5, readout_connector_metal_spacing=10,
+            top_connector_depth=120, drive_port_spacing=15, flux_port_spacing=5,
+            overall_portWidth=10, route_radius=50,
+            tranmission_width=20, tranmission_tunnel_width=12, tranmission_resonator_offset=4,
+            resoantor_length=285,
+        ),
+    )
+    for row in rows:
+        failed = {name: count for name, count in (row.get('drc') or {}).items() if count}
+        print(row['name'] + (' (stored)' if row['stored'] else ''), row['error'] or f"{row['build_time']:.2f}s build, {row['extract_time']:.2f}s extract, {row['drc_time']:.2f}s drc, {row['write_time']:.2f}s write, {row['polygons']} polygons, drc {failed or 'clean'}")
+    print(f'sweep finished in {time.perf_counter() - start:.1f}s')
@@ -0,0 +1,98 @@
+import atexit
+import contextlib
+import json
+import os
+import threading
+import time
+
+# structured events from the layout code (resonator length and frequency, ...) instead of prints
+# off by default: emit() returns at once, and call sites computing extra values for an event check `enabled` first
+# QUDIT_TELEMETRY=<path> turns it on with a JSON-lines file sink at path
+enabled = False
+sinks = []
+
+
+class MemorySink:
+    def __init__(self):
+        self.events = []
+
+    def write(self, event):
+        self.events.append(event)
+
+    def flush(self):
+        pass
+
+
+class FileSink:
+    # events are appended to path as JSON lines, batch_size at a time
+    def __init__(self, path, batch_size=256):
+        self.path = path
+        self.batch_size = batch_size
+        self.buffer = []
+        self.lock = threading.Lock()
+
+    def write(self, event):
+        with self.lock:
+            self.buffer.append(event)
+            if len(self.buffer) < self.batch_size:
+                return
+            batch, self.buffer = self.buffer, []
+        self._append(batch)
+
+    def flush(self):
+        with self.lock:
+            batch, self.buffer = self.buffer, []
+        if batch:
+            self._append(batch)
+
+    def _append(self, batch):
+        with open(self.path, 'a') as f:
+            f.write(''.join(json.dumps(event) + '\n' for event in batch))
+
+
+def enable(flag=True):
+    global enabled
+    enabled = flag
+
+
+def add_sink(sink):
+    sinks.append(sink)
+    enable()
+    return sink
+
+
+def remove_sink(sink):
+    sink.flush()
+    sinks.remove(sink)
+
+
+def emit(event, **fields):
+    if not enabled:
+        return
+    record = dict(event=event, time=time.time(), pid=os.getpid(), **fields)
+    for sink in sinks:
+        sink.write(record)
+
+
+def flush():
+    for sink in sinks:
+        sink.flush()
+
+
+@contextlib.contextmanager
+def capture():
+    # events emitted inside the block, as a list of dicts
+    global enabled
+    was_enabled = enabled
+    sink = add_sink(MemorySink())
+    try:
+        yield sink.events
+    finally:
+        remove_sink(sink)
+        enabled = was_enabled
+
+
+if os.environ.get('QUDIT_TELEMETRY'):
+    add_sink(FileSink(os.environ['QUDIT_TELEMETRY']))
+
+atexit.register(flush)
@@ -1,9 +1,6 @@
 import numpy as np
 import matplotlib.pyplot as plt
-
-# Define the Lorentzian function
-def lorentzian(f, f0, gamma):
-    return (gamma/2)**2 / ((f - f0)**2 + (gamma/2)**2)
+from readout import discrimination, lorentzian
 
 # First set of parameters
 frequencies_1 = np.linspace(6.750, 6.764, 1000)
@@ -44,3 +41,7 @@ ax2.grid(True)
 
 plt.tight_layout()
 plt.savefig('cavity_comparison.jpg')
+
+# overlap and SNR of the two cases (shift = 2 chi), readout.py evaluates them over whole grids
+for shift, gamma in ((0.9e6, 6e6), (1.2e6, 3e6)):
+    print(f'{shift/1e6} MHz shift | {gamma/1e6} MHz linewidth:', discrimination(shift/2, gamma))
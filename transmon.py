@@ -0,0 +1,110 @@
+import cachetools
+import numpy as np
+
+import circuit
+
+# exact levels of the transmon / qudit in the charge basis, H = 4 E_c (n - n_g)^2 - E_j/2 (|n><n+1| + h.c.),
+# beyond the sqrt(8 E_j E_c) - E_c asymptote: every level and transition of the d lowest states
+# in units of E_c the spectrum only depends on E_j/E_c and n_g, so solutions are cached on a grid of those two,
+# a batch is solved once per grid point (stacked numpy.linalg.eigvalsh / eigh)
+# energies in J like circuit.py, frequencies in Hz
+n_cut = 15  # charge states -n_cut..n_cut, enough for 8 levels to 1e-6 E_c up to E_j/E_c ~ 300
+ratio_step = 1e-6  # relative grid of E_j/E_c
+n_g_step = 1e-4
+# a design or a coupled_spacing sweep (hamiltonian.sweep_spacing) revisits a few grid points per qudit, and an
+# inverse design a few hundred; an entry of 8 levels and their charge elements is under 1 kB
+cache_size = 4096
+cache = cachetools.LRUCache(cache_size)
+stats = {'hits': 0, 'misses': 0}
+
+
+def quantize(ratio, n_g):
+    # grid points of E_j/E_c (relative step) and n_g (the spectrum has period 1 and is even in n_g)
+    ratio = np.exp(np.round(np.log(ratio)/ratio_step)*ratio_step)
+    n_g = np.round(np.asarray(n_g) % 1/n_g_step)*n_g_step
+    return ratio, np.minimum(n_g, 1 - n_g)
+
+
+def hamiltonians(ratio, n_g, n_cut=n_cut):
+    # stacked charge-basis matrices in units of E_c, ratio and n_g are 1d
+    n = np.arange(-n_cut, n_cut + 1)
+    size = len(n)
+    H = np.zeros((len(ratio), size, size))
+    H[:, np.arange(size), np.arange(size)] = 4*(n - n_g[:, np.newaxis])**2
+    off = -np.asarray(ratio)[:, np.newaxis]/2
+    H[:, np.arange(size - 1), np.arange(1, size)] = off
+    H[:, np.arange(1, size), np.arange(size - 1)] = off
+    return H
+
+
+def solve(ratio, n_g, d, n_cut=n_cut, charge=False):
+    # (eigenvalues in units of E_c, shape (..., d)) and with charge=True the charge matrix
+    # elements <j|n|k> (..., d, d) as well; only grid points missing from the cache are diagonalized
+    ratio, n_g = np.broadcast_arrays(*quantize(ratio, n_g))
+    shape = ratio.shape
+    points, inverse = np.unique(np.stack([ratio.ravel(), n_g.ravel()], axis=1), axis=0, return_inverse=True)
+    keys = [(r, g, d, n_cut, charge) for r, g in points.tolist()]
+    # the stored points are copied out before the missing ones go in, a batch larger than the cache evicts its own
+    solved = [cache.get(key) for key in keys]
+    missing = [i for i, entry in enumerate(solved) if entry is None]
+    stats['hits'] += len(keys) - len(missing)
+    stats['misses'] += len(missing)
+    if missing:
+        H = hamiltonians(points[missing, 0], points[missing, 1], n_cut)
+        if charge:
+            energies, vectors = np.linalg.eigh(H)
+            vectors = vectors[..., :d]
+            n = np.arange(-n_cut, n_cut + 1, dtype=float)
+            elements = np.einsum('bij,i,bik->bjk', vectors, n, vectors)
+        else:
+            energies = np.linalg.eigvalsh(H)
+        energies = energies[:, :d]
+        for j, i in enumerate(missing):
+            solved[i] = (energies[j], elements[j]) if charge else energies[j]
+            cache[keys[i]] = solved[i]
+    if charge:
+        energies = np.stack([entry[0] for entry in solved])[inverse.ravel()]
+        elements = np.stack([entry[1] for entry in solved])[inverse.ravel()]
+        return energies.reshape(shape + (d,)), elements.reshape(shape + (d, d))
+    return np.stack(solved)[inverse.ravel()].reshape(shape + (d,))
+
+
+def levels(E_j, E_c, n_g=0, d=4, n_cut=n_cut):
+    # energies of the d lowest states above the ground state, J
+    E_j, E_c = np.broadcast_arrays(np.asarray(E_j, dtype=float), np.asarray(E_c, dtype=float))
+    energies = solve(E_j/E_c, n_g, d, n_cut)
+    return (energies - energies[..., :1])*E_c[..., np.newaxis]
+
+
+def transitions(E_j, E_c, n_g=0, d=4, n_cut=n_cut):
+    # f_01, f_12, ..., f_(d-2)(d-1) in Hz
+    return np.diff(levels(E_j, E_c, n_g, d, n_cut), axis=-1)/circuit.h
+
+
+def anharmonicities(E_j, E_c, n_g=0, d=4, n_cut=n_cut):
+    # f_(k+1)(k+2) - f_k(k+1) in Hz, negative for a transmon
+    return np.diff(transitions(E_j, E_c, n_g, d, n_cut), axis=-1)
+
+
+def charge_dispersion(E_j, E_c, d=4, n_cut=n_cut):
+    # peak-to-peak change of each level over n_g (between n_g = 0 and 1/2), Hz
+    E_j, E_c = np.broadcast_arrays(np.asarray(E_j, dtype=float), np.asarray(E_c, dtype=float))
+    ratio = E_j/E_c
+    spread = np.abs(solve(ratio, 0.5, d, n_cut) - solve(ratio, 0, d, n_cut))
+    return spread*E_c[..., np.newaxis]/circuit.h
+
+
+def charge_elements(E_j, E_c, n_g=0, d=4, n_cut=n_cut):
+    # <j|n|k> between the d lowest states, the coupling operator of the qudit
+    E_j, E_c = np.broadcast_arrays(np.asarray(E_j, dtype=float), np.asarray(E_c, dtype=float))
+    return solve(E_j/E_c, n_g, d, n_cut, charge=True)[1]
+
+
+def hit_rate():
+    lookups = stats['hits'] + stats['misses']
+    return stats['hits']/lookups if lookups else 0.0
+
+
+def clear_cache():
+    cache.clear()
+    stats['hits'] = stats['misses'] = 0